@@ -25,6 +25,7 @@ from django.views import View
 from datetime import datetime
 
 from stamps.services.stamp.stamp_service import StampService
+from stamps.views.mixins import KeysetPaginationMixin, StampSummaryMixin
 
 
 @anonymous_required(path_url="main_topics")
@@ -119,7 +120,9 @@ def edit_profile(request):
     return render(request, "profile/edit_profile.html", context)
 
 
-class MyStampListView(LoginRequiredMixin, ListView):
+class MyStampListView(
+    LoginRequiredMixin, StampSummaryMixin, KeysetPaginationMixin, ListView
+):
     template_name = "stamps/my_stamps.html"
     context_object_name = "stamps"
     paginate_by = 10
@@ -145,7 +148,7 @@ class MyStampListView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        qs = self.object_list
+        summary = self.summary
         context.update(
             {
                 "companies": Company.objects.filter(
@@ -155,12 +158,14 @@ class MyStampListView(LoginRequiredMixin, ListView):
                 "date_from": self.request.GET.get("date_from", ""),
                 "date_to": self.request.GET.get("date_to", ""),
                 "sort_by": self.request.GET.get("sort", "-created_at"),
-                "total_all_companies": self.service.total_amount(qs),
+                "total_all_companies": summary["total"],
             }
         )
         return context
 
-class MyExpectedStampListView(LoginRequiredMixin, ListView):
+class MyExpectedStampListView(
+    LoginRequiredMixin, StampSummaryMixin, KeysetPaginationMixin, ListView
+):
     template_name = "stamps/my_expected_stamps.html"
     context_object_name = "expected_stamps"
     paginate_by = 10
@@ -186,7 +191,7 @@ class MyExpectedStampListView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        qs = self.object_list
+        summary = self.summary
         context.update(
             {
                 "sectors": Sector.objects.all(),
@@ -194,7 +199,7 @@ class MyExpectedStampListView(LoginRequiredMixin, ListView):
                 "date_from": self.request.GET.get("date_from", ""),
                 "date_to": self.request.GET.get("date_to", ""),
                 "sort_by": self.request.GET.get("sort", "-created_at"),
-                "total_all_sectors": self.service.total_amount(qs),
+                "total_all_sectors": summary["total"],
             }
         )
         return context
@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import random
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def cache_key(namespace: str, *parts) -> str:
+    """Build a namespaced key, e.g. cache_key("pension", 3, 2026) → "pension:3:2026"."""
+    return ":".join([namespace, *(str(part) for part in parts)])
+
+
+def jittered(timeout, jitter: float = 0.1):
+    """Spread expiries by ±``jitter`` so keys set together don't expire together."""
+    if not timeout:
+        return timeout
+    return max(1, int(timeout * random.uniform(1 - jitter, 1 + jitter)))
+
+
+def get_or_compute(
+    key,
+    compute,
+    timeout=300,
+    jitter: float = 0.1,
+    lock_timeout: int = 30,
+    wait: float = 5.0,
+    should_cache=None,
+):
+    """
+    Return the cached value for ``key`` or compute and store it.
+
+    Only one process computes a missing key at a time (a cache.add lock);
+    the others poll for up to ``wait`` seconds for its result before
+    computing it themselves. ``timeout`` is jittered. ``should_cache(value)``
+    can veto storing a result (e.g. a failed lookup).
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + wait
+    while not cache.add(lock_key, 1, lock_timeout):
+        if time.monotonic() >= deadline:
+            logger.warning(f"Timed out waiting for {key} to be computed, computing it here")
+            return compute()
+        time.sleep(0.05)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+    try:
+        # Another process may have filled it between our get() and add()
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if should_cache is None or should_cache(value):
+                cache.set(key, value, jittered(timeout, jitter))
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def cached_payload(key, compute, timeout=300, **kwargs):
+    """
+    get_or_compute() for HTTP endpoints: caches ``{"etag", "last_modified",
+    "data": compute()}``. The ETag is derived from ``key``, so keys that
+    embed a data version give a new ETag whenever the data changes.
+    """
+    return get_or_compute(
+        key,
+        lambda: {
+            "etag": hashlib.md5(key.encode()).hexdigest(),
+            "last_modified": timezone.now(),
+            "data": compute(),
+        },
+        timeout,
+        **kwargs,
+    )
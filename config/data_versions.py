@@ -0,0 +1,77 @@
+"""
+Monotonic data-version counters that cached results and ETags are keyed on.
+
+A scope names a slice of data: the whole stamp ledger, one company, one
+sector, one user's stamps, the site configuration or the site's pages and
+SEO settings. Writers bump the scopes they touched (after commit); readers
+build their cache keys from current_version() of the scopes they depend
+on, so a write makes the old entries unreachable instead of waiting for a
+TTL.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+LEDGER = "ledger"
+COMPANY = "company"
+SECTOR = "sector"
+USER = "user"
+SITE_CONFIG = "site_config"
+SITE_CONTENT = "site_content"
+
+KEY_PREFIX = "data_version"
+
+
+def scope(kind: str, obj_id=None) -> str:
+    """scope(COMPANY, 5) → "company:5"; scope(LEDGER) → "ledger"."""
+    return kind if obj_id is None else f"{kind}:{obj_id}"
+
+
+def _key(name: str) -> str:
+    return f"{KEY_PREFIX}:{name}"
+
+
+def _seed() -> int:
+    # A counter that is missing (first use, eviction, cache flush) restarts
+    # from the clock, so it never goes back to a value readers already saw
+    return time.time_ns() // 1000
+
+
+def current_version(name: str) -> int:
+    """The current counter of scope ``name``."""
+    version = cache.get(_key(name))
+    if version is None:
+        seed = _seed()
+        cache.add(_key(name), seed, None)
+        version = cache.get(_key(name), seed)
+    return version
+
+
+def current_versions(*names) -> dict:
+    """{scope: version} for several scopes in one cache round trip."""
+    found = cache.get_many([_key(name) for name in names])
+    return {
+        name: found[_key(name)] if _key(name) in found else current_version(name)
+        for name in names
+    }
+
+
+def version_tag(*names) -> str:
+    """Compact string of the scopes' versions, for cache keys and ETags."""
+    versions = current_versions(*names)
+    return "-".join(f"{name}.{versions[name]}" for name in names)
+
+
+def bump(*names):
+    for name in dict.fromkeys(names):
+        cache.add(_key(name), _seed(), None)
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(_key(name), _seed(), None)
+
+
+def bump_on_commit(*names):
+    transaction.on_commit(lambda: bump(*names))
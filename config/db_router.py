@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+# Set inside read_from_replica(): reads may go to the replica alias
+_use_replica = ContextVar("use_replica", default=False)
+# Set for the whole request when the client recently wrote (sticky cookie)
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+# Set by the router as soon as the current request/task writes; scoped by
+# primary_write_scope() so it does not outlive the unit of work
+_wrote_to_primary = ContextVar("wrote_to_primary", default=False)
+
+
+def replica_alias():
+    alias = getattr(settings, "REPLICA_DATABASE_ALIAS", "replica")
+    return alias if alias in connections.settings else None
+
+
+@contextmanager
+def read_from_replica():
+    """Send the reads inside this block to the replica, if one is configured."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def use_replica(func):
+    """Decorator form of read_from_replica() for views and service methods."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with read_from_replica():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def primary_write_scope():
+    """
+    Track writes to the primary afresh inside this block (a request, a task):
+    the flag starts cleared and the outer value is restored on exit, so a
+    long-lived worker is not pinned to the primary by an earlier write.
+    Outside any scope (shell, one-off commands) a write pins the rest of the
+    process, which keeps read-your-writes.
+    """
+    token = _wrote_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _wrote_to_primary.reset(token)
+
+
+def wrote_to_primary() -> bool:
+    """Whether the current scope has written to a sticky app."""
+    return _wrote_to_primary.get()
+
+
+def with_primary_write_scope(func):
+    """Decorator form of primary_write_scope() for tasks."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with primary_write_scope():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Reads go to the primary unless the caller opted in with
+    read_from_replica(). Even then the primary is used once the current
+    request has written to a sticky app, or the client wrote within the last
+    REPLICA_STICKY_SECONDS (see ReplicaStickinessMiddleware), so users
+    always see their own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or _pinned_to_primary.get() or _wrote_to_primary.get():
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in getattr(settings, "REPLICA_STICKY_APPS", []):
+            _wrote_to_primary.set(True)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica mirrors the primary, so objects from either may relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-writes for replica routing: a request that writes to a sticky
+    app sets a short-lived cookie, and requests carrying it read from the
+    primary until it expires.
+    """
+
+    COOKIE_NAME = "primary_pin"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = _pinned_to_primary.set(self.COOKIE_NAME in request.COOKIES)
+        try:
+            with primary_write_scope():
+                response = self.get_response(request)
+                if wrote_to_primary():
+                    response.set_cookie(
+                        self.COOKIE_NAME,
+                        "1",
+                        max_age=getattr(settings, "REPLICA_STICKY_SECONDS", 10),
+                        httponly=True,
+                        samesite="Lax",
+                    )
+            return response
+        finally:
+            _pinned_to_primary.reset(pinned)
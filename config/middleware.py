@@ -3,7 +3,7 @@ from stamps.tasks import send_email
 from django.conf import settings
 import requests
 from site_settings.models import AdminAllowedIP
-from django.core.cache import cache
+from config.cache import cache_key, get_or_compute
 import logging
 import ipaddress
 from datetime import datetime
@@ -43,12 +43,16 @@ class AdminIPRestrictionMiddleware:
                 },
             }
 
-        # Check cache first (cache for 24 hours to avoid rate limits)
-        cache_key = f"ip_info_{ip}"
-        cached_info = cache.get(cache_key)
-        if cached_info:
-            return cached_info
+        # Cache for 24 hours to avoid rate limits; failed lookups are retried
+        return get_or_compute(
+            cache_key("ip_info", ip),
+            lambda: self._lookup_ip_info(ip),
+            86400,
+            should_cache=lambda info: isinstance(info["geolocation"], dict),
+        )
 
+    def _lookup_ip_info(self, ip):
+        """Query the geolocation services in turn (uncached)"""
         info = {
             "ip": ip,
             "geolocation": None,
@@ -76,8 +80,6 @@ class AdminIPRestrictionMiddleware:
                     parsed = service["parser"](data)
                     if parsed:
                         info["geolocation"] = parsed
-                        # Cache for 24 hours
-                        cache.set(cache_key, info, 86400)
                         logger.info(
                             f"Successfully retrieved IP info from {service['name']}"
                         )
@@ -201,18 +203,16 @@ class AdminIPRestrictionMiddleware:
 
     def _get_allowed_ips(self):
         """Fetch allowed admin IPs from the database or cache"""
-        allowed_ips = cache.get(CACHE_KEY)
-        if allowed_ips is None:
-            allowed_ips = list(
+        allowed_ips = get_or_compute(
+            CACHE_KEY,
+            lambda: list(
                 AdminAllowedIP.objects.filter(active=True).values_list(
                     "ip_address", flat=True
                 )
-            )
-            cache.set(CACHE_KEY, allowed_ips, CACHE_TIMEOUT)
-            return allowed_ips
-        else:
-            allowed_ips = DEFAULT_IPS_ADDRESS
-            return allowed_ips
+            ),
+            CACHE_TIMEOUT,
+        )
+        return allowed_ips
 
     def _format_geolocation(self, geo):
         """Format geolocation data for email"""
@@ -0,0 +1,76 @@
+import hashlib
+import logging
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that avoids an exact COUNT(*) on every page load.
+
+    - Unfiltered querysets on PostgreSQL use the planner estimate from
+      ``pg_class.reltuples`` once the table is large enough for it to matter.
+    - Other querysets on PostgreSQL use an exact count cached for
+      ``COUNT_CACHE_TIMEOUT`` seconds.
+    - Any other database (SQLite in development) counts exactly.
+    """
+
+    ESTIMATE_THRESHOLD = 10_000
+    COUNT_CACHE_TIMEOUT = 30
+
+    @staticmethod
+    def _is_unfiltered(queryset) -> bool:
+        query = queryset.query
+        return not (
+            query.where
+            or query.group_by is not None
+            or query.distinct
+            or query.is_sliced
+            or query.combinator
+        )
+
+    @staticmethod
+    def estimated_count(queryset):
+        """Row estimate of the queryset's table, or None if never analyzed."""
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] >= 0 else None
+
+    def _cached_count(self, queryset) -> int:
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(
+            f"{queryset.db}:{sql}:{params!r}".encode(), usedforsecurity=False
+        ).hexdigest()
+        key = f"paginator_count:{digest}"
+
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.COUNT_CACHE_TIMEOUT)
+        return count
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or connections[queryset.db].vendor != "postgresql":
+            return super().count
+
+        try:
+            if self._is_unfiltered(queryset):
+                estimate = self.estimated_count(queryset)
+                if estimate is not None and estimate >= self.ESTIMATE_THRESHOLD:
+                    return estimate
+            return self._cached_count(queryset)
+        except Exception as e:
+            logger.warning(f"Approximate count failed, counting exactly: {e}")
+            return super().count
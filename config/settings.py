@@ -1,4 +1,5 @@
 from pathlib import Path
+import copy
 import os
 import environ
 from django.templatetags.static import static
@@ -116,6 +117,7 @@ PWA_APP_LANG = "ar"
 
 MIDDLEWARE = [
     # "config.middleware.AdminIPRestrictionMiddleware",
+    "config.db_router.ReplicaStickinessMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -186,6 +188,73 @@ DATABASES = {
     }
 }
 
+# Connection reuse. Web processes use a psycopg pool (sized per process).
+# Long-running processes such as the django_tasks worker can set DB_POOL=False
+# and keep one persistent connection, health-checked before each use instead.
+DB_POOL = env.bool("DB_POOL", default=True)
+
+# Health checks: with the pool, Django passes the pool's check_connection so
+# a connection is pinged when it is handed out and broken ones are replaced;
+# without it, the persistent connection is checked before each request.
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+            # Seconds to wait for a free connection before raising
+            "timeout": env.float("DB_POOL_TIMEOUT", default=10),
+            # Recycle connections so server-side restarts/failovers are picked up
+            "max_lifetime": env.float("DB_POOL_MAX_LIFETIME", default=30 * 60),
+            "max_idle": env.float("DB_POOL_MAX_IDLE", default=5 * 60),
+        }
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+
+# Optional read replica for dashboards, grouped views and exports (see
+# config/db_router.py). Locally, pointing DB_REPLICA_HOST at the primary
+# gives two aliases on one database.
+REPLICA_DATABASE_ALIAS = "replica"
+REPLICA_STICKY_APPS = ["stamps"]
+REPLICA_STICKY_SECONDS = env.int("DB_REPLICA_STICKY_SECONDS", default=10)
+
+if env("DB_REPLICA_HOST", default=None):
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        **copy.deepcopy(DATABASES["default"]),
+        "HOST": env("DB_REPLICA_HOST"),
+        "NAME": env("DB_REPLICA_NAME", default=DATABASES["default"]["NAME"]),
+        "USER": env("DB_REPLICA_USER", default=DATABASES["default"]["USER"]),
+        "PASSWORD": env("DB_REPLICA_PASSWORD", default=DATABASES["default"]["PASSWORD"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+
+# Shared cache: recalc scheduling locks, pension/site-settings versions and
+# fragment caches must be visible to every worker, so production uses Redis.
+# Without REDIS_URL (local dev, tests) each process gets a local-memory cache.
+REDIS_URL = env("REDIS_URL", default=None)
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": env("CACHE_KEY_PREFIX", default="cms"),
+            "TIMEOUT": 300,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "cms",
+            "KEY_PREFIX": "cms",
+        }
+    }
+
 # TASKS = {"default": {"BACKEND": "django_tasks.backends.database.DatabaseBackend"}}
 
 LOGGING = {
@@ -1,4 +1,6 @@
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.paginator import EmptyPage, PageNotAnInteger
+
+from config.paginator import ApproximateCountPaginator
 
 
 class PaginationService:
@@ -21,7 +23,7 @@ class PaginationService:
             page_size = cls.DEFAULT_PAGE_SIZE
 
         page_number = request.GET.get("page", 1)
-        paginator = Paginator(queryset, page_size)
+        paginator = ApproximateCountPaginator(queryset, page_size)
 
         try:
             page = paginator.page(page_number)
@@ -6,3 +6,6 @@ class SettingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'site_settings'
     verbose_name = _("Settings Management")
+
+    def ready(self):
+        import site_settings.signals
@@ -0,0 +1,78 @@
+import logging
+import threading
+
+from config import data_versions
+from site_settings.models import Page, SEOSettings, SiteConfiguration
+
+logger = logging.getLogger(__name__)
+
+
+class SiteSettingsCache:
+    """
+    Process-local copy of the site_settings objects every page needs
+    (SiteConfiguration, active pages, page_url → Page/SEOSettings).
+
+    Each worker keeps its own snapshot and checks the shared data versions
+    before using it: SiteConfiguration writes bump the site config scope,
+    Page/SEOSettings writes the site content scope, so every worker reloads
+    on its next check.
+    """
+
+    SCOPES = (data_versions.SITE_CONFIG, data_versions.SITE_CONTENT)
+
+    _lock = threading.Lock()
+    # (version, snapshot) swapped as one tuple so readers never see a mix
+    _state = (None, None)
+
+    @classmethod
+    def version(cls) -> str:
+        return data_versions.version_tag(*cls.SCOPES)
+
+    @staticmethod
+    def _load() -> dict:
+        pages = list(Page.objects.all())
+
+        seo_by_page = {}
+        for seo in SEOSettings.objects.order_by("id"):
+            seo_by_page.setdefault(seo.page_id, seo)
+
+        return {
+            "configuration": SiteConfiguration.objects.first(),
+            "active_pages": [page for page in pages if page.active],
+            "pages_by_path": {page.page_url: page for page in pages},
+            "seo_by_page": seo_by_page,
+        }
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """The current snapshot; costs one cache read unless it must reload."""
+        version = cls.version()
+        loaded_version, snapshot = cls._state
+        if snapshot is not None and loaded_version == version:
+            return snapshot
+
+        with cls._lock:
+            loaded_version, snapshot = cls._state
+            if snapshot is None or loaded_version != version:
+                snapshot = cls._load()
+                cls._state = (version, snapshot)
+                logger.info(f"Reloaded site settings snapshot (version {version})")
+            return snapshot
+
+    @classmethod
+    def configuration(cls):
+        return cls.snapshot()["configuration"]
+
+    @classmethod
+    def active_pages(cls) -> list:
+        return cls.snapshot()["active_pages"]
+
+    @classmethod
+    def page_for_path(cls, path):
+        return cls.snapshot()["pages_by_path"].get(path)
+
+    @classmethod
+    def seo_for_path(cls, path):
+        snapshot = cls.snapshot()
+        page = snapshot["pages_by_path"].get(path)
+        return snapshot["seo_by_page"].get(page.id) if page else None
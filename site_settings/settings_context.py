@@ -1,35 +1,75 @@
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from stamps.services.pension_service import PensionSnapshotService
 from stamps.services.stamp.stamp_service import StampService
-from .models import SiteConfiguration, Page, SEOSettings
+from .services.site_settings_cache import SiteSettingsCache
+
+
+def _request_cached(request, key, compute):
+    """
+    Memoize ``compute()`` on the request, so every render within one request
+    (and both context processors) share a single evaluation.
+    """
+    values = request.__dict__.setdefault("_site_context", {})
+    if key not in values:
+        values[key] = compute()
+    return values[key]
+
+
+def _lazy(request, key, compute):
+    """Context value that only runs ``compute`` when a template reads it."""
+    return SimpleLazyObject(lambda: _request_cached(request, key, compute))
+
+
+def _site_settings(request):
+    # One version check per request; the snapshot itself is process-local
+    return _request_cached(request, "site_settings", SiteSettingsCache.snapshot)
+
+
+def _seo(request):
+    page = _site_settings(request)["pages_by_path"].get(request.path)
+    if not page:
+        return None
+    return _site_settings(request)["seo_by_page"].get(page.id)
+
 
 def site_config_context(request):
     """
     Context processor to add site configuration to templates.
     """
-    config = SiteConfiguration.objects.first()
     return {
-        "site_configuration": config
+        "site_configuration": _lazy(
+            request, "site_configuration", lambda: _site_settings(request)["configuration"]
+        )
     }
 
 
 def seo_context(request):
-    service = StampService()
-    pages = Page.objects.filter(active=True)
-    # Try to find matching Page using URL path
-    page = Page.objects.filter(page_url=request.path).first()
-
-    seo = None
-    if page:
-        seo = SEOSettings.objects.filter(page=page).first()
-
-    
-    qs = StampService.get_queryset()
-    stamps_this_month = StampService.get_this_month(qs)
-    total_pension= service.calculate_pension(service.get_queryset())
-
     return {
-        "current_page": page,
-        "seo": seo,
-        "pages": pages,
-        "stamps_this_month": stamps_this_month,
-        "total_pension": total_pension,
+        "current_page": _lazy(
+            request,
+            "current_page",
+            lambda: _site_settings(request)["pages_by_path"].get(request.path),
+        ),
+        "seo": _lazy(request, "seo", lambda: _seo(request)),
+        "pages": _lazy(request, "pages", lambda: _site_settings(request)["active_pages"]),
+        "stamps_this_month": _lazy(
+            request, "stamps_this_month", StampService.this_month_activity
+        ),
+        # Fragment cache key of the banner: changes with any stamp write,
+        # SiteConfiguration change (pension) or new month
+        "stamps_banner_version": _lazy(
+            request,
+            "stamps_banner_version",
+            lambda: f"{PensionSnapshotService.version()}:{timezone.now():%Y-%m}",
+        ),
+        "total_pension": _lazy(
+            request, "total_pension", PensionSnapshotService.total_pension
+        ),
+        # Views override total_pension with filtered figures; the cached
+        # banner always shows the site-wide one
+        "site_total_pension": _lazy(
+            request, "total_pension", PensionSnapshotService.total_pension
+        ),
     }
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config import data_versions
+
+from .models import Page, SEOSettings, SiteConfiguration
+
+
+@receiver(post_save, sender=SiteConfiguration)
+@receiver(post_delete, sender=SiteConfiguration)
+def bump_site_config_version(sender, instance, **kwargs):
+    """
+    Every worker reloads its site settings snapshot on its next request, and
+    caches built on the site configuration (pension snapshot) recompute
+    """
+    data_versions.bump_on_commit(data_versions.SITE_CONFIG)
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=SEOSettings)
+@receiver(post_delete, sender=SEOSettings)
+def bump_site_content_version(sender, instance, **kwargs):
+    """
+    Every worker reloads its site settings snapshot on its next request;
+    pages and SEO settings feed no other cache
+    """
+    data_versions.bump_on_commit(data_versions.SITE_CONTENT)
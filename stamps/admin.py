@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import *
 from unfold.admin import ModelAdmin as UnfoldModelAdmin
 from django_summernote.admin import SummernoteModelAdmin
+from config.paginator import ApproximateCountPaginator
 
 
 def format_millions(value):
@@ -39,6 +40,9 @@ class SectorAdmin(UnfoldModelAdmin):
 
 @admin.register(StampCalculation)
 class StampCalculationAdmin(UnfoldModelAdmin,SummernoteModelAdmin):
+    # No exact COUNT(*) of the whole ledger on every changelist load
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     list_display = [
         "company",
         "invoice_date",
@@ -80,6 +84,9 @@ class StampCalculationAdmin(UnfoldModelAdmin,SummernoteModelAdmin):
 
 @admin.register(ExpectedStamp)
 class ExpectedStampAdmin(UnfoldModelAdmin,SummernoteModelAdmin):
+    # No exact COUNT(*) of the whole ledger on every changelist load
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     list_display = [
         "sector",
         "invoice_date",
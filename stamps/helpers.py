@@ -1,10 +1,36 @@
+from contextlib import contextmanager
 from stamps.services.erp_service import ERPNextClient
 import logging
+import threading
 
 from stamps.templatetags.number_filters import millions
 
 logger = logging.getLogger(__name__)
 
+_erp_sync_lock = threading.Lock()
+_erp_sync_suspensions = 0
+
+
+@contextmanager
+def suspend_erp_sync():
+    """
+    Process-wide switch that stops the stamp signals from queuing ERPNext
+    sync/delete tasks (bulk jobs, stress tests). Ledger totals are still
+    maintained; callers are responsible for syncing afterwards if needed.
+    """
+    global _erp_sync_suspensions
+    with _erp_sync_lock:
+        _erp_sync_suspensions += 1
+    try:
+        yield
+    finally:
+        with _erp_sync_lock:
+            _erp_sync_suspensions -= 1
+
+
+def erp_sync_suspended() -> bool:
+    return _erp_sync_suspensions > 0
+
 
 def map_stamp_calculation(obj):
     return {
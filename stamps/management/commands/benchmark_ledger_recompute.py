@@ -0,0 +1,120 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from stamps.models import Company, ExpectedStamp, Sector, StampCalculation
+from stamps.services.ledger_service import LedgerService
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the ledger recompute (window function) against the legacy "
+        "per-record aggregate loop. All data is created inside a transaction "
+        "that is rolled back."
+    )
+
+    LEDGERS = {
+        "stamp": (StampCalculation, Company),
+        "expected": (ExpectedStamp, Sector),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1_000, 10_000, 100_000],
+            help="Rows per entity to benchmark",
+        )
+        parser.add_argument(
+            "--ledger", choices=self.LEDGERS.keys(), default="stamp"
+        )
+        parser.add_argument(
+            "--legacy-limit",
+            type=int,
+            default=10_000,
+            help="Skip the O(n²) legacy loop above this many rows",
+        )
+
+    def handle(self, *args, **options):
+        model, entity_model = self.LEDGERS[options["ledger"]]
+
+        for size in options["sizes"]:
+            with transaction.atomic():
+                entity = self.seed(model, entity_model, size)
+
+                started = time.perf_counter()
+                result = LedgerService.recompute(model, entity.id)
+                window_seconds = time.perf_counter() - started
+
+                line = (
+                    f"{size:>7} rows | window: {window_seconds:8.3f}s "
+                    f"({result['updated']} updated)"
+                )
+
+                if size <= options["legacy_limit"]:
+                    model.objects.filter(
+                        **{LedgerService.entity_field(model): entity.id}
+                    ).update(total_past_years=0, total_stamp_for_company=0)
+
+                    started = time.perf_counter()
+                    self.legacy_recompute(model, entity)
+                    legacy_seconds = time.perf_counter() - started
+                    line += f" | legacy: {legacy_seconds:8.3f}s"
+                else:
+                    line += " | legacy: skipped"
+
+                self.stdout.write(line)
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished (no data kept)"))
+
+    def seed(self, model, entity_model, size):
+        user = get_user_model().objects.order_by("id").first()
+        if user is None:
+            user = get_user_model().objects.create(username=f"bench-{uuid.uuid4().hex[:8]}")
+
+        entity = entity_model.objects.create(name=f"__benchmark__ {uuid.uuid4()}")
+        entity_field = model.LEDGER_ENTITY_FIELD
+
+        model.objects.bulk_create(
+            (
+                model(
+                    **{entity_field: entity},
+                    user=user,
+                    value_of_work=Decimal(1_000 + i),
+                    invoice_copies=1,
+                    d1=Decimal(i % 97 + 1),
+                    total_past_years=0,
+                    total_stamp_for_company=0,
+                )
+                for i in range(size)
+            ),
+            batch_size=5_000,
+        )
+        return entity
+
+    @staticmethod
+    def legacy_recompute(model, entity):
+        """The pre-window-function algorithm: one aggregate per record."""
+        entity_field = model.LEDGER_ENTITY_FIELD
+        records_to_update = []
+
+        for record in model.objects.filter(**{entity_field: entity}).order_by("created_at"):
+            past_total = (
+                model.objects.filter(
+                    **{entity_field: entity}, created_at__lt=record.created_at
+                ).aggregate(models.Sum("d1"))["d1__sum"]
+                or 0
+            )
+            record.total_past_years = past_total
+            record.total_stamp_for_company = record.d1 + past_total
+            records_to_update.append(record)
+
+        model.objects.bulk_update(
+            records_to_update, LedgerService.UPDATE_FIELDS, batch_size=1_000
+        )
@@ -0,0 +1,86 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests/sec of the stamp list view through the full request "
+        "cycle (middleware, connection handling, rendering). Run it once with "
+        "DB_POOL=False DB_CONN_MAX_AGE=0 and once with the pool to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per thread")
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--url", default=None, help="Path to request (default: stamp list)")
+        parser.add_argument("--warmup", type=int, default=5)
+
+    def describe_connections(self) -> str:
+        db = settings.DATABASES["default"]
+        pool = db.get("OPTIONS", {}).get("pool")
+        if pool:
+            return f"psycopg pool (min {pool.get('min_size')}, max {pool.get('max_size')})"
+        if db.get("CONN_MAX_AGE"):
+            return f"persistent connections (CONN_MAX_AGE={db['CONN_MAX_AGE']})"
+        return "new connection per request"
+
+    def handle(self, *args, **options):
+        url = options["url"] or reverse("stamp_list")
+        host = (settings.ALLOWED_HOSTS or ["localhost"])[0].lstrip(".").replace("*", "localhost")
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(options["threads"])
+
+        def worker():
+            client = Client(HTTP_HOST=host)
+            try:
+                for _ in range(options["warmup"]):
+                    client.get(url)
+                start.wait()
+                for _ in range(options["requests"]):
+                    began = time.perf_counter()
+                    # The test client skips the connection handling a real
+                    # server does around each request; do it explicitly
+                    close_old_connections()
+                    response = client.get(url)
+                    close_old_connections()
+                    elapsed = time.perf_counter() - began
+                    with lock:
+                        if response.status_code != 200:
+                            errors.append(response.status_code)
+                        latencies.append(elapsed)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - began
+
+        if not latencies:
+            raise CommandError(f"No request completed: {errors[:1]!r}")
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(f"GET {url} — {self.describe_connections()}")
+        self.stdout.write(
+            f"{len(latencies)} requests from {options['threads']} threads in {wall:.2f}s "
+            f"→ {len(latencies) / wall:.1f} req/s "
+            f"(mean {statistics.mean(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms)"
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"{len(errors)} failed requests, first: {errors[0]!r}"))
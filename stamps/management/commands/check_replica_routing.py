@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+
+from config.db_router import primary_write_scope, read_from_replica, replica_alias
+from stamps.models import Company, StampCalculation
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the replica router: reads outside read_from_replica() use the "
+        "primary, reads inside it use the replica, and a stamps write pins "
+        "later reads to the primary. Works locally with DB_REPLICA_HOST "
+        "pointing at the same server."
+    )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica alias configured (set DB_REPLICA_HOST)")
+
+        with primary_write_scope():
+            checks = [("plain read", router.db_for_read(StampCalculation), "default")]
+
+            with read_from_replica():
+                checks.append(("read in replica block", router.db_for_read(StampCalculation), alias))
+                checks.append(("replica queryset", StampCalculation.objects.all().db, alias))
+
+                with transaction.atomic():
+                    company = Company.objects.create(name="__replica_routing_check__")
+                    transaction.set_rollback(True)
+                checks.append(("write", company._state.db, "default"))
+                checks.append(("read after write", router.db_for_read(StampCalculation), "default"))
+
+        failed = False
+        for name, actual, expected in checks:
+            ok = actual == expected
+            failed |= not ok
+            line = f"{'✓' if ok else '✗'} {name}: {actual} (expected {expected})"
+            self.stdout.write(line if ok else self.style.ERROR(line))
+
+        if failed:
+            raise CommandError("Replica routing is misconfigured")
+        self.stdout.write(self.style.SUCCESS("✅ Replica routing and stickiness work"))
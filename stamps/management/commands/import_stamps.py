@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from stamps.models import ExpectedStamp, StampCalculation
+from stamps.services.import_service import StampImportError, StampImportService
+from stamps.tasks import (
+    sync_expected_stamps_batch_to_erpnext_task,
+    sync_stamps_batch_to_erpnext_task,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import historical stamps from a CSV or XLSX file. "
+        "Columns: company|sector, value_of_work, invoice_copies, invoice_date, "
+        "stamp_rate, exchange_rate, note"
+    )
+
+    LEDGERS = {
+        "stamp": (StampCalculation, sync_stamps_batch_to_erpnext_task),
+        "expected": (ExpectedStamp, sync_expected_stamps_batch_to_erpnext_task),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file to import")
+        parser.add_argument("--ledger", choices=self.LEDGERS.keys(), default="stamp")
+        parser.add_argument(
+            "--user", required=True, help="Username or email the records belong to"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=StampImportService.DEFAULT_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--skip-erp-sync",
+            action="store_true",
+            help="Do not queue the ERPNext sync for the imported records",
+        )
+
+    def handle(self, *args, **options):
+        model, sync_task = self.LEDGERS[options["ledger"]]
+
+        user = (
+            get_user_model()
+            .objects.filter(Q(username=options["user"]) | Q(email=options["user"]))
+            .first()
+        )
+        if user is None:
+            raise CommandError(f"User {options['user']!r} not found")
+
+        started = time.perf_counter()
+        try:
+            result = StampImportService.import_rows(
+                model,
+                StampImportService.read_rows(options["path"]),
+                user,
+                batch_size=options["batch_size"],
+            )
+        except (StampImportError, OSError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        created = len(result["created_ids"])
+        rate = created / elapsed * 60 if elapsed else created
+        self.stdout.write(
+            f"• Imported {created} rows for {len(result['entity_ids'])} "
+            f"{model.LEDGER_ENTITY_FIELD} entities in {elapsed:.1f}s ({rate:,.0f} rows/min)"
+        )
+
+        for line, error in result["errors"][:20]:
+            self.stdout.write(self.style.WARNING(f"  line {line}: {error}"))
+        if result["errors"]:
+            self.stdout.write(self.style.WARNING(f"• Skipped {len(result['errors'])} invalid rows"))
+
+        drifted = StampImportService.verify(model, result["entity_ids"])
+        if drifted:
+            self.stdout.write(self.style.WARNING(f"• Ledger verification repaired {drifted} rows"))
+        else:
+            self.stdout.write("• Ledger verification passed")
+
+        if created and not options["skip_erp_sync"]:
+            sync_task.enqueue(result["created_ids"])
+            self.stdout.write("• Queued one batched ERPNext sync")
+
+        self.stdout.write(self.style.SUCCESS("✅ Import finished"))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stamps.models import ExpectedStamp, StampCalculation
+from stamps.services.ledger_service import LedgerService
+from config import data_versions
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild (or verify) the per-company and per-sector stamp balance "
+        "tables and the yearly rollups"
+    )
+
+    LEDGERS = {
+        "stamp": StampCalculation,
+        "expected": ExpectedStamp,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ledger",
+            choices=self.LEDGERS.keys(),
+            help="Only process one ledger (default: both)",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report balances that differ from the ledger, write nothing",
+        )
+
+    def handle(self, *args, **options):
+        ledgers = (
+            [self.LEDGERS[options["ledger"]]]
+            if options["ledger"]
+            else self.LEDGERS.values()
+        )
+        verify = options["verify"]
+        failed = False
+        scopes = []
+
+        for model in ledgers:
+            checks = [
+                (
+                    LedgerService.balance_model(model).__name__,
+                    LedgerService.rebuild_balances(model, dry_run=verify),
+                ),
+                (
+                    f"StampYearlyRollup ({model.LEDGER_ENTITY_FIELD})",
+                    LedgerService.rebuild_rollups(model, dry_run=verify),
+                ),
+            ]
+
+            for table_name, mismatched in checks:
+                if not mismatched:
+                    self.stdout.write(f"• {table_name}: all rows match the ledger")
+                    continue
+
+                if verify:
+                    failed = True
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f"• {table_name}: {len(mismatched)} rows differ "
+                            f"(first: {', '.join(map(str, mismatched[:20]))})"
+                        )
+                    )
+                else:
+                    self.stdout.write(f"• {table_name}: rebuilt {len(mismatched)} rows")
+                    # Balance rows are keyed by entity id, rollups by (entity id, year)
+                    entity_ids = {key[0] if isinstance(key, tuple) else key for key in mismatched}
+                    scopes += LedgerService.version_scopes(model, entity_ids)
+
+        if scopes:
+            data_versions.bump(*scopes)
+
+        if failed:
+            raise CommandError("Balance verification failed")
+
+        self.stdout.write(self.style.SUCCESS("✅ Stamp balances are consistent"))
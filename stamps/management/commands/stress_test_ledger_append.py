@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from stamps.helpers import suspend_erp_sync
+from stamps.models import Company, ExpectedStamp, Sector, StampCalculation
+from stamps.services.ledger_service import LedgerService
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert stamps for one entity from many threads at once, then check "
+        "that every running total and the balance row are exact. "
+        "ERPNext sync is suspended and the test entity is deleted afterwards."
+    )
+
+    LEDGERS = {
+        "stamp": (StampCalculation, Company),
+        "expected": (ExpectedStamp, Sector),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ledger", choices=self.LEDGERS.keys(), default="stamp")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--inserts", type=int, default=50, help="Inserts per thread")
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the test entity and its records"
+        )
+
+    def handle(self, *args, **options):
+        model, entity_model = self.LEDGERS[options["ledger"]]
+
+        if connection.vendor != "postgresql":
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Running on {connection.vendor}: row locks are not enforced, "
+                    "results do not reflect production contention"
+                )
+            )
+
+        user = get_user_model().objects.order_by("id").first()
+        if user is None:
+            raise CommandError("At least one user is required")
+
+        with suspend_erp_sync():
+            entity = entity_model.objects.create(name=f"__stress__ {uuid.uuid4()}")
+            try:
+                elapsed, errors = self.run_threads(model, entity, user, options)
+                self.report(model, entity, options, elapsed, errors)
+            finally:
+                if not options["keep"]:
+                    entity.delete()
+
+    def run_threads(self, model, entity, user, options):
+        errors = []
+        start = threading.Barrier(options["threads"])
+
+        def worker():
+            try:
+                start.wait()
+                for _ in range(options["inserts"]):
+                    model(
+                        **{model.LEDGER_ENTITY_FIELD: entity},
+                        user=user,
+                        value_of_work=Decimal(random.randint(10_000, 10_000_000)),
+                        invoice_copies=random.randint(1, 5),
+                    ).save()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, errors
+
+    def report(self, model, entity, options, elapsed, errors):
+        expected_rows = options["threads"] * options["inserts"]
+        drift = LedgerService.recompute(model, entity.id, dry_run=True)
+        balance = LedgerService.get_balance(model, entity.id)
+        totals = LedgerService.entity_totals(model, entity.id)
+        balance_ok = balance is not None and all(
+            getattr(balance, field) == totals[field]
+            for field in LedgerService.BALANCE_FIELDS
+        )
+
+        self.stdout.write(
+            f"{drift['scanned']}/{expected_rows} rows from {options['threads']} threads "
+            f"in {elapsed:.2f}s → {drift['scanned'] / elapsed:.1f} inserts/sec"
+        )
+        self.stdout.write(f"Rows with wrong running totals: {drift['updated']}")
+        self.stdout.write(f"Balance row matches ledger: {balance_ok}")
+
+        if errors:
+            self.stdout.write(self.style.ERROR(f"{len(errors)} threads failed: {errors[0]!r}"))
+
+        if errors or drift["updated"] or not balance_ok or drift["scanned"] != expected_rows:
+            raise CommandError("Concurrent append produced an inconsistent ledger")
+
+        self.stdout.write(self.style.SUCCESS("✅ Ledger stayed consistent under contention"))
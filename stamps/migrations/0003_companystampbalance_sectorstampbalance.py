@@ -0,0 +1,77 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_balances(apps, schema_editor):
+    ledgers = [
+        ("StampCalculation", "CompanyStampBalance", "company_id"),
+        ("ExpectedStamp", "SectorStampBalance", "sector_id"),
+    ]
+    for ledger_name, balance_name, entity_field in ledgers:
+        ledger = apps.get_model("stamps", ledger_name)
+        balance = apps.get_model("stamps", balance_name)
+
+        rows = (
+            ledger.objects.order_by()
+            .values(entity_field)
+            .annotate(
+                total_d1=models.Sum("d1"),
+                record_count=models.Count("id"),
+                total_invoice_copies=models.Sum("invoice_copies"),
+            )
+        )
+        balance.objects.bulk_create(
+            [
+                balance(
+                    **{entity_field: row[entity_field]},
+                    total_d1=row["total_d1"] or 0,
+                    record_count=row["record_count"],
+                    total_invoice_copies=row["total_invoice_copies"] or 0,
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stamps', '0002_alter_expectedstamp_invoice_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyStampBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_d1', models.DecimalField(decimal_places=0, default=0, max_digits=19, verbose_name='Running total')),
+                ('record_count', models.PositiveIntegerField(default=0, verbose_name='Record count')),
+                ('total_invoice_copies', models.PositiveBigIntegerField(default=0, verbose_name='Total invoice copies')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated_at')),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stamp_balance', to='stamps.company', verbose_name='Company')),
+            ],
+            options={
+                'verbose_name': 'Company Stamp Balance',
+                'verbose_name_plural': 'Company Stamp Balances',
+            },
+        ),
+        migrations.CreateModel(
+            name='SectorStampBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_d1', models.DecimalField(decimal_places=0, default=0, max_digits=19, verbose_name='Running total')),
+                ('record_count', models.PositiveIntegerField(default=0, verbose_name='Record count')),
+                ('total_invoice_copies', models.PositiveBigIntegerField(default=0, verbose_name='Total invoice copies')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated_at')),
+                ('sector', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stamp_balance', to='stamps.sector', verbose_name='Sector')),
+            ],
+            options={
+                'verbose_name': 'Sector Stamp Balance',
+                'verbose_name_plural': 'Sector Stamp Balances',
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
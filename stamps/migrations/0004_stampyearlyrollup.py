@@ -0,0 +1,69 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import ExtractYear
+
+
+def populate_rollups(apps, schema_editor):
+    ledgers = [
+        ("StampCalculation", "company_id"),
+        ("ExpectedStamp", "sector_id"),
+    ]
+    rollup = apps.get_model("stamps", "StampYearlyRollup")
+
+    for ledger_name, entity_field in ledgers:
+        ledger = apps.get_model("stamps", ledger_name)
+        rows = (
+            ledger.objects.filter(invoice_date__isnull=False)
+            .annotate(year=ExtractYear("invoice_date"))
+            .order_by()
+            .values(entity_field, "year")
+            .annotate(
+                total_d1=models.Sum("d1"),
+                record_count=models.Count("id"),
+                total_invoice_copies=models.Sum("invoice_copies"),
+            )
+        )
+        rollup.objects.bulk_create(
+            [
+                rollup(
+                    **{entity_field: row[entity_field]},
+                    year=row["year"],
+                    total_d1=row["total_d1"] or 0,
+                    record_count=row["record_count"],
+                    total_invoice_copies=row["total_invoice_copies"] or 0,
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stamps', '0003_companystampbalance_sectorstampbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StampYearlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Year')),
+                ('total_d1', models.DecimalField(decimal_places=0, default=0, max_digits=19, verbose_name='Total stamp duty')),
+                ('record_count', models.PositiveIntegerField(default=0, verbose_name='Record count')),
+                ('total_invoice_copies', models.PositiveBigIntegerField(default=0, verbose_name='Total invoice copies')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='yearly_rollups', to='stamps.company', verbose_name='Company')),
+                ('sector', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='yearly_rollups', to='stamps.sector', verbose_name='Sector')),
+            ],
+            options={
+                'verbose_name': 'Stamp Yearly Rollup',
+                'verbose_name_plural': 'Stamp Yearly Rollups',
+                'indexes': [models.Index(fields=['year'], name='stamps_rollup_year_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('company__isnull', False)), fields=('company', 'year'), name='unique_company_year_rollup'), models.UniqueConstraint(condition=models.Q(('sector__isnull', False)), fields=('sector', 'year'), name='unique_sector_year_rollup'), models.CheckConstraint(condition=models.Q(models.Q(('company__isnull', False), ('sector__isnull', True)), models.Q(('company__isnull', True), ('sector__isnull', False)), _connector='OR'), name='rollup_single_entity')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
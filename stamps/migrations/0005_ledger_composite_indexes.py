@@ -0,0 +1,113 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+LEDGERS = ["StampCalculation", "ExpectedStamp"]
+
+
+def invoice_date_indexes(schema_editor, model):
+    """Names of the single-column invoice_date indexes (the former db_index=True)."""
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return [
+        name
+        for name, info in constraints.items()
+        if info["index"]
+        and info["columns"] == ["invoice_date"]
+        and not (info["primary_key"] or info["unique"])
+    ]
+
+
+def drop_invoice_date_indexes(apps, schema_editor):
+    for model_name in LEDGERS:
+        model = apps.get_model("stamps", model_name)
+        for name in invoice_date_indexes(schema_editor, model):
+            schema_editor.execute(
+                f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}"
+            )
+
+
+def create_invoice_date_indexes(apps, schema_editor):
+    for model_name in LEDGERS:
+        model = apps.get_model("stamps", model_name)
+        table = model._meta.db_table
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+            f"{schema_editor.quote_name(f'{table}_invoice_date_idx')} "
+            f"ON {schema_editor.quote_name(table)} ({schema_editor.quote_name('invoice_date')})"
+        )
+
+
+class Migration(migrations.Migration):
+    # The ledger tables are large: build and drop the indexes CONCURRENTLY so
+    # writes are not blocked during the deploy (not possible in a transaction)
+    atomic = False
+
+    dependencies = [
+        ('stamps', '0004_stampyearlyrollup'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='stampcalculation',
+            index=models.Index(fields=['company', 'created_at', 'id'], include=('d1',), name='stamp_company_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stampcalculation',
+            index=models.Index(fields=['company', 'invoice_date'], include=('d1',), name='stamp_company_invoice_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stampcalculation',
+            index=models.Index(fields=['user', 'created_at'], name='stamp_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stampcalculation',
+            index=models.Index(fields=['created_at', 'id'], name='stamp_created_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stampcalculation',
+            index=models.Index(fields=['invoice_date', 'id'], name='stamp_invoice_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='expectedstamp',
+            index=models.Index(fields=['sector', 'created_at', 'id'], include=('d1',), name='expected_sector_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='expectedstamp',
+            index=models.Index(fields=['sector', 'invoice_date'], include=('d1',), name='expected_sector_invoice_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='expectedstamp',
+            index=models.Index(fields=['user', 'created_at'], name='expected_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='expectedstamp',
+            index=models.Index(fields=['created_at', 'id'], name='expected_created_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='expectedstamp',
+            index=models.Index(fields=['invoice_date', 'id'], name='expected_invoice_id_idx'),
+        ),
+        # invoice_date loses db_index=True; dropped last, once (invoice_date, id)
+        # is in place to supersede it
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='stampcalculation',
+                    name='invoice_date',
+                    field=models.DateField(blank=True, null=True, verbose_name='Invoice Date'),
+                ),
+                migrations.AlterField(
+                    model_name='expectedstamp',
+                    name='invoice_date',
+                    field=models.DateField(blank=True, null=True, verbose_name='Invoice Date'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(drop_invoice_date_indexes, create_invoice_date_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:20
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def populate_summaries(apps, schema_editor):
+    ledgers = [
+        ("StampCalculation", "CompanyStampBalance", "company_id"),
+        ("ExpectedStamp", "SectorStampBalance", "sector_id"),
+    ]
+    for ledger_name, balance_name, entity_field in ledgers:
+        ledger = apps.get_model("stamps", ledger_name)
+        balance = apps.get_model("stamps", balance_name)
+
+        summaries = {}
+        rows = (
+            ledger.objects.order_by()
+            .values(entity_field, "stamp_rate")
+            .annotate(record_count=models.Count("id"), last_invoice_date=models.Max("invoice_date"))
+        )
+        for row in rows:
+            summary = summaries.setdefault(
+                row[entity_field], {"last_invoice_date": None, "rate_counts": {}}
+            )
+            key = str(Decimal(str(row["stamp_rate"])).quantize(Decimal("0.0001")))
+            summary["rate_counts"][key] = summary["rate_counts"].get(key, 0) + row["record_count"]
+            if row["last_invoice_date"] and (
+                summary["last_invoice_date"] is None
+                or row["last_invoice_date"] > summary["last_invoice_date"]
+            ):
+                summary["last_invoice_date"] = row["last_invoice_date"]
+
+        to_update = []
+        for obj in balance.objects.filter(**{f"{entity_field}__in": summaries}):
+            summary = summaries[getattr(obj, entity_field)]
+            obj.last_invoice_date = summary["last_invoice_date"]
+            obj.rate_counts = summary["rate_counts"]
+            obj.dominant_rate = max(
+                (count, Decimal(rate)) for rate, count in summary["rate_counts"].items()
+            )[1]
+            to_update.append(obj)
+        balance.objects.bulk_update(
+            to_update, ["last_invoice_date", "rate_counts", "dominant_rate"], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stamps', '0005_ledger_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companystampbalance',
+            name='dominant_rate',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True, verbose_name='Dominant stamp rate'),
+        ),
+        migrations.AddField(
+            model_name='companystampbalance',
+            name='last_invoice_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Last invoice date'),
+        ),
+        migrations.AddField(
+            model_name='companystampbalance',
+            name='rate_counts',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Records per stamp rate'),
+        ),
+        migrations.AddField(
+            model_name='sectorstampbalance',
+            name='dominant_rate',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True, verbose_name='Dominant stamp rate'),
+        ),
+        migrations.AddField(
+            model_name='sectorstampbalance',
+            name='last_invoice_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Last invoice date'),
+        ),
+        migrations.AddField(
+            model_name='sectorstampbalance',
+            name='rate_counts',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Records per stamp rate'),
+        ),
+        migrations.AddIndex(
+            model_name='companystampbalance',
+            index=models.Index(condition=models.Q(('record_count__gt', 0)), fields=['-total_d1', 'id'], name='company_balance_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectorstampbalance',
+            index=models.Index(condition=models.Q(('record_count__gt', 0)), fields=['-total_d1', 'id'], name='sector_balance_total_idx'),
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
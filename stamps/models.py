@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
+from stamps.services.ledger_service import LedgerService
+
 
 class Company(models.Model):
     name = models.CharField(_("Company name"), max_length=200, unique=True)
@@ -18,6 +20,9 @@ class Company(models.Model):
 
 
 class StampCalculation(models.Model):
+    LEDGER_ENTITY_FIELD = "company"
+    LEDGER_BALANCE_MODEL = "CompanyStampBalance"
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -34,9 +39,7 @@ class StampCalculation(models.Model):
     )
     value_of_work = models.DecimalField(_("Value Of Work (A)"), max_digits=19, decimal_places=0)
     invoice_copies = models.PositiveIntegerField(_("Invoice Copies (B)"))
-    invoice_date = models.DateField(
-        _("Invoice Date"), null=True, blank=True, db_index=True
-    )
+    invoice_date = models.DateField(_("Invoice Date"), null=True, blank=True)
     stamp_rate = models.DecimalField(_("Stamp rate (C)"), max_digits=6, decimal_places=4, default=0.0015)
     exchange_rate = models.DecimalField(_("Exchange Rate"), max_digits=10, decimal_places=4, default=1, validators=[MinValueValidator(0.0001)],help_text="سعر الصرف لتحويل القيمة إذا كانت بالعملة الأجنبية")
 
@@ -56,34 +59,32 @@ class StampCalculation(models.Model):
         ordering = ["-created_at"]
         verbose_name = _("Stamp Calculation")
         verbose_name_plural = _("Stamp Calculations")
+        indexes = [
+            # ترتيب الدفتر لكل شركة (الأرصدة التراكمية والصفحات)، ويغطي d1 للمجاميع
+            models.Index(
+                fields=["company", "created_at", "id"],
+                include=["d1"],
+                name="stamp_company_created_idx",
+            ),
+            models.Index(
+                fields=["company", "invoice_date"],
+                include=["d1"],
+                name="stamp_company_invoice_idx",
+            ),
+            models.Index(fields=["user", "created_at"], name="stamp_user_created_idx"),
+            # صفحات القائمة بدون فلتر (keyset على created_at أو invoice_date)
+            models.Index(fields=["created_at", "id"], name="stamp_created_id_idx"),
+            models.Index(fields=["invoice_date", "id"], name="stamp_invoice_id_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         # احسب D1
         self.d1 = self.value_of_work * self.invoice_copies * self.stamp_rate * self.exchange_rate
 
-        # احسب كل السابق لنفس الشركة قبل إنشاء هذا السجل
-        if self.pk:  
-            # لو بنعمل تحديث → استثني التسجيل الحالي فقط
-            past_total = (
-                StampCalculation.objects
-                .filter(company=self.company)
-                .exclude(pk=self.pk)
-                .aggregate(models.Sum("d1"))["d1__sum"] or 0
-            )
-        else:
-            # لو أول مرة يتحفظ → اجمع كل السابق لنفس الشركة
-            past_total = (
-                StampCalculation.objects
-                .filter(company=self.company)
-                .aggregate(models.Sum("d1"))["d1__sum"] or 0
-            )
-
-        self.total_past_years = past_total
-
-        # احسب الإجمالي
-        self.total_stamp_for_company = self.d1 + self.total_past_years
-
-        super().save(*args, **kwargs)
+        # احسب كل السابق لنفس الشركة، وتعديل السجلات اللاحقة يتم في post_save داخل نفس المعاملة
+        with transaction.atomic():
+            LedgerService.prepare_save(self)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.company} "
@@ -101,6 +102,9 @@ class Sector(models.Model):
         return f"{self.name}"
 
 class ExpectedStamp(models.Model):
+    LEDGER_ENTITY_FIELD = "sector"
+    LEDGER_BALANCE_MODEL = "SectorStampBalance"
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -117,9 +121,7 @@ class ExpectedStamp(models.Model):
     )
     value_of_work = models.DecimalField(_("Value Of Work (A)"), max_digits=19, decimal_places=0)
     invoice_copies = models.PositiveIntegerField(_("Invoice Copies (B)"))
-    invoice_date = models.DateField(
-        _("Invoice Date"), null=True, blank=True, db_index=True
-    )
+    invoice_date = models.DateField(_("Invoice Date"), null=True, blank=True)
     stamp_rate = models.DecimalField(_("Stamp rate (C)"), max_digits=6, decimal_places=4, default=0.0015)
     exchange_rate = models.DecimalField(_("Exchange Rate"), max_digits=10, decimal_places=4, default=1, validators=[MinValueValidator(0.0001)],help_text="سعر الصرف لتحويل القيمة إذا كانت بالعملة الأجنبية")
 
@@ -138,34 +140,146 @@ class ExpectedStamp(models.Model):
     class Meta:
         verbose_name = _("Expected Stamp")
         verbose_name_plural = _("Expected Stamps")
+        indexes = [
+            # ترتيب الدفتر لكل قطاع (الأرصدة التراكمية والصفحات)، ويغطي d1 للمجاميع
+            models.Index(
+                fields=["sector", "created_at", "id"],
+                include=["d1"],
+                name="expected_sector_created_idx",
+            ),
+            models.Index(
+                fields=["sector", "invoice_date"],
+                include=["d1"],
+                name="expected_sector_invoice_idx",
+            ),
+            models.Index(fields=["user", "created_at"], name="expected_user_created_idx"),
+            # صفحات القائمة بدون فلتر (keyset على created_at أو invoice_date)
+            models.Index(fields=["created_at", "id"], name="expected_created_id_idx"),
+            models.Index(fields=["invoice_date", "id"], name="expected_invoice_id_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         # احسب D1
         self.d1 = self.value_of_work * self.invoice_copies * self.stamp_rate * self.exchange_rate
 
-        # احسب كل السابق لنفس القطاع قبل إنشاء هذا السجل
-        if self.pk:  
-            # لو بنعمل تحديث → استثني التسجيل الحالي فقط
-            past_total = (
-                ExpectedStamp.objects
-                .filter(sector=self.sector)
-                .exclude(pk=self.pk)
-                .aggregate(models.Sum("d1"))["d1__sum"] or 0
-            )
-        else:
-            # لو أول مرة يتحفظ → اجمع كل السابق لنفس القطاع
-            past_total = (
-                ExpectedStamp.objects
-                .filter(sector=self.sector)
-                .aggregate(models.Sum("d1"))["d1__sum"] or 0
-            )
-
-        self.total_past_years = past_total
-
-        # احسب الإجمالي
-        self.total_stamp_for_company = self.d1 + self.total_past_years
-
-        super().save(*args, **kwargs)
+        # احسب كل السابق لنفس القطاع، وتعديل السجلات اللاحقة يتم في post_save داخل نفس المعاملة
+        with transaction.atomic():
+            LedgerService.prepare_save(self)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.sector} {self.invoice_date.year if self.invoice_date else ''}"
+
+
+class CompanyStampBalance(models.Model):
+    company = models.OneToOneField(
+        Company,
+        on_delete=models.CASCADE,
+        related_name="stamp_balance",
+        verbose_name=_("Company"),
+    )
+    total_d1 = models.DecimalField(_("Running total"), max_digits=19, decimal_places=0, default=0)
+    record_count = models.PositiveIntegerField(_("Record count"), default=0)
+    total_invoice_copies = models.PositiveBigIntegerField(_("Total invoice copies"), default=0)
+    # ملخص تعرضه صفحة التجميع: آخر تاريخ فاتورة وعدد المطالبات لكل نسبة دمغة والنسبة الأكثر استخدامًا
+    last_invoice_date = models.DateField(_("Last invoice date"), null=True, blank=True)
+    rate_counts = models.JSONField(_("Records per stamp rate"), default=dict, blank=True)
+    dominant_rate = models.DecimalField(_("Dominant stamp rate"), max_digits=6, decimal_places=4, null=True, blank=True)
+    updated_at = models.DateTimeField(_("updated_at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Company Stamp Balance")
+        verbose_name_plural = _("Company Stamp Balances")
+        indexes = [
+            # صفحة التجميع ترتب حسب الإجمالي مباشرة من هذا الفهرس
+            models.Index(
+                fields=["-total_d1", "id"],
+                condition=models.Q(record_count__gt=0),
+                name="company_balance_total_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.company_id}: {self.total_d1}"
+
+
+class SectorStampBalance(models.Model):
+    sector = models.OneToOneField(
+        Sector,
+        on_delete=models.CASCADE,
+        related_name="stamp_balance",
+        verbose_name=_("Sector"),
+    )
+    total_d1 = models.DecimalField(_("Running total"), max_digits=19, decimal_places=0, default=0)
+    record_count = models.PositiveIntegerField(_("Record count"), default=0)
+    total_invoice_copies = models.PositiveBigIntegerField(_("Total invoice copies"), default=0)
+    # ملخص تعرضه صفحة التجميع: آخر تاريخ فاتورة وعدد المطالبات لكل نسبة دمغة والنسبة الأكثر استخدامًا
+    last_invoice_date = models.DateField(_("Last invoice date"), null=True, blank=True)
+    rate_counts = models.JSONField(_("Records per stamp rate"), default=dict, blank=True)
+    dominant_rate = models.DecimalField(_("Dominant stamp rate"), max_digits=6, decimal_places=4, null=True, blank=True)
+    updated_at = models.DateTimeField(_("updated_at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Sector Stamp Balance")
+        verbose_name_plural = _("Sector Stamp Balances")
+        indexes = [
+            # صفحة التجميع ترتب حسب الإجمالي مباشرة من هذا الفهرس
+            models.Index(
+                fields=["-total_d1", "id"],
+                condition=models.Q(record_count__gt=0),
+                name="sector_balance_total_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sector_id}: {self.total_d1}"
+
+
+class StampYearlyRollup(models.Model):
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name="yearly_rollups",
+        verbose_name=_("Company"),
+        null=True,
+        blank=True,
+    )
+    sector = models.ForeignKey(
+        Sector,
+        on_delete=models.CASCADE,
+        related_name="yearly_rollups",
+        verbose_name=_("Sector"),
+        null=True,
+        blank=True,
+    )
+    year = models.PositiveSmallIntegerField(_("Year"))
+    total_d1 = models.DecimalField(_("Total stamp duty"), max_digits=19, decimal_places=0, default=0)
+    record_count = models.PositiveIntegerField(_("Record count"), default=0)
+    total_invoice_copies = models.PositiveBigIntegerField(_("Total invoice copies"), default=0)
+
+    class Meta:
+        verbose_name = _("Stamp Yearly Rollup")
+        verbose_name_plural = _("Stamp Yearly Rollups")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["company", "year"],
+                condition=models.Q(company__isnull=False),
+                name="unique_company_year_rollup",
+            ),
+            models.UniqueConstraint(
+                fields=["sector", "year"],
+                condition=models.Q(sector__isnull=False),
+                name="unique_sector_year_rollup",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(company__isnull=False, sector__isnull=True)
+                | models.Q(company__isnull=True, sector__isnull=False),
+                name="rollup_single_entity",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["year"], name="stamps_rollup_year_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.company_id or self.sector_id} {self.year}: {self.total_d1}"
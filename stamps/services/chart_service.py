@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import Sum
+from django.db.models.functions import ExtractYear
+
+from stamps.services.ledger_service import LedgerService
+
+
+class YearlyChartService:
+    """
+    Yearly and cumulative d1 series of a ledger queryset, computed by the
+    database in one windowed query:
+
+        SUM(SUM(total)) OVER (ORDER BY year)
+
+    With ``top`` it also returns the same series for the ``top`` companies
+    (or sectors) with the largest total, from the same round trip. Values
+    stay ``Decimal`` here; formatting is left to the caller.
+
+    The ORM cannot nest an aggregate inside a window function, so the
+    grouped queryset is compiled and wrapped in a CTE.
+    """
+
+    MAX_TOP = 20
+
+    @staticmethod
+    def yearly_source(service, queryset, entity_field=None):
+        """Grouped (year[, entity], total) queryset; the whole ledger is read from the rollups."""
+        group_by = ["year", entity_field] if entity_field else ["year"]
+
+        if service.uses_rollup(queryset):
+            model = service.ledger_model
+            source = LedgerService.rollup_model(model).objects.filter(
+                **{f"{LedgerService.entity_field(model)}__isnull": False}
+            )
+            total = Sum("total_d1")
+        else:
+            source = queryset.filter(invoice_date__isnull=False).annotate(
+                year=ExtractYear("invoice_date")
+            )
+            total = Sum("d1")
+
+        return source.values(*group_by).annotate(total=total).order_by()
+
+    @classmethod
+    def fetch(cls, service, queryset, top: int = 0) -> dict:
+        """
+        {"categories": [year, ...], "yearly": [...], "cumulative": [...],
+        "breakdown": [{"id", "name", "yearly", "cumulative"}, ...]}, with one
+        value per category in every series.
+        """
+        model = service.ledger_model
+        top = max(0, min(top or 0, cls.MAX_TOP))
+        entity_field = LedgerService.entity_field(model) if top else None
+
+        source = cls.yearly_source(service, queryset, entity_field)
+        connection = connections[source.db]
+        inner_sql, params = source.query.get_compiler(connection=connection).as_sql()
+        qn = connection.ops.quote_name
+
+        year, total = qn("year"), qn("total")
+
+        if top:
+            entity = model._meta.get_field(model.LEDGER_ENTITY_FIELD)
+            entity_id = qn(entity.column)
+            sql = f"""
+                WITH yearly AS ({inner_sql}),
+                top_entities AS (
+                    SELECT y.{entity_id} AS entity_id, e.{qn("name")} AS name
+                    FROM yearly y
+                    JOIN {qn(entity.related_model._meta.db_table)} e ON e.{qn("id")} = y.{entity_id}
+                    GROUP BY y.{entity_id}, e.{qn("name")}
+                    ORDER BY SUM(y.{total}) DESC, y.{entity_id}
+                    LIMIT %s
+                )
+                SELECT {year}, NULL, NULL, SUM({total}),
+                       SUM(SUM({total})) OVER (ORDER BY {year})
+                FROM yearly
+                GROUP BY {year}
+                UNION ALL
+                SELECT y.{year}, t.entity_id, t.name, y.{total},
+                       SUM(y.{total}) OVER (PARTITION BY t.entity_id ORDER BY y.{year})
+                FROM yearly y
+                JOIN top_entities t ON t.entity_id = y.{entity_id}
+            """
+            params = (*params, top)
+        else:
+            sql = f"""
+                WITH yearly AS ({inner_sql})
+                SELECT {year}, NULL, NULL, {total}, SUM({total}) OVER (ORDER BY {year})
+                FROM yearly
+            """
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        return cls._series(rows)
+
+    @staticmethod
+    def _decimal(value) -> Decimal:
+        if value is None:
+            return Decimal("0")
+        return value if isinstance(value, Decimal) else Decimal(str(value))
+
+    @classmethod
+    def _series(cls, rows) -> dict:
+        overall = {}
+        entities = {}
+        for year, entity_id, name, total, cumulative in rows:
+            point = (cls._decimal(total), cls._decimal(cumulative))
+            if entity_id is None:
+                overall[int(year)] = point
+            else:
+                entity = entities.setdefault(entity_id, {"id": entity_id, "name": name, "points": {}})
+                entity["points"][int(year)] = point
+
+        categories = sorted(overall)
+        breakdown = []
+        for entity in entities.values():
+            # Years the entity has no records in: nothing added, total carried over
+            yearly, cumulative, running = [], [], Decimal("0")
+            for year in categories:
+                total, running = entity["points"].get(year, (Decimal("0"), running))
+                yearly.append(total)
+                cumulative.append(running)
+            breakdown.append(
+                {"id": entity["id"], "name": entity["name"], "yearly": yearly, "cumulative": cumulative}
+            )
+        breakdown.sort(key=lambda entity: (-entity["cumulative"][-1], entity["id"]))
+
+        return {
+            "categories": categories,
+            "yearly": [overall[year][0] for year in categories],
+            "cumulative": [overall[year][1] for year in categories],
+            "breakdown": breakdown,
+        }
@@ -0,0 +1,84 @@
+import logging
+
+from django.utils import timezone
+
+from config import data_versions
+from config.cache import cache_key, cached_payload
+from stamps.services.chart_service import YearlyChartService
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardService:
+    """
+    Chart series, totals and pension of a stamp dashboard for one time window,
+    optionally with a per-company/sector breakdown of the ``top`` largest.
+
+    Results are cached per (ledger, window, top, day, data version): any ledger
+    write or SiteConfiguration change moves the version, and the day is part
+    of the key because the windows are relative to today. The payload's
+    ``etag`` and ``last_modified`` let the endpoints answer revalidations
+    with a 304.
+    """
+
+    FILTER_MAP = {
+        "all": None,
+        "last_3_year": 3,
+        "last_5_years": 5,
+        "last_7_years": 7,
+        "last_10_years": 10,
+    }
+    DEFAULT_FILTER = "all"
+    # The pension depends on SiteConfiguration.number_of_retired_engineers
+    SCOPES = (data_versions.LEDGER, data_versions.SITE_CONFIG)
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    def __init__(self, service):
+        self.service = service
+
+    @classmethod
+    def clean_filter(cls, time_filter) -> str:
+        return time_filter if time_filter in cls.FILTER_MAP else cls.DEFAULT_FILTER
+
+    @staticmethod
+    def clean_top(top) -> int:
+        try:
+            return max(0, min(int(top), YearlyChartService.MAX_TOP))
+        except (TypeError, ValueError):
+            return 0
+
+    def cache_key(self, time_filter: str, top: int = 0) -> str:
+        return cache_key(
+            "dashboard",
+            self.service.ledger_model._meta.model_name,
+            time_filter,
+            top,
+            timezone.now().date().isoformat(),
+            data_versions.version_tag(*self.SCOPES),
+        )
+
+    def get_data(self, time_filter, top=0) -> dict:
+        time_filter, top = self.clean_filter(time_filter), self.clean_top(top)
+        key = self.cache_key(time_filter, top)
+        return cached_payload(
+            key, lambda: self.compute(time_filter, top, key), self.CACHE_TIMEOUT
+        )
+
+    def compute(self, time_filter: str, top: int, key: str) -> dict:
+        queryset = self.service.filter_by_years(
+            self.service.get_queryset(), self.FILTER_MAP[time_filter]
+        )
+        chart = self.service.yearly_chart(queryset, top)
+        summary = self.service.summarize(queryset)
+        logger.info(f"Computed dashboard data {key}")
+
+        return {
+            "filter": time_filter,
+            "categories": chart["categories"],
+            "yearly": chart["yearly"],
+            "cumulative": chart["cumulative"],
+            "breakdown": chart["breakdown"],
+            "total": float(summary["total"]),
+            "count": summary["count"],
+            "pension": float(summary["pension"]),
+        }
@@ -1,14 +1,17 @@
-from stamps.models import ExpectedStamp, Sector
+from stamps.models import ExpectedStamp, Sector, SectorStampBalance
 from django.db.models import Sum, Q
 from typing import Optional
 from decimal import Decimal
 from stamps.services.main_stamp_service import BaseStampService
+from stamps.services.ledger_service import LedgerService
 from .expected_stamp_excel_service import ExpectedStampExcelService
 from .expected_stamp_pdf_service import ExpectedStampPDFService
 
 
 class ExpectedStampService(BaseStampService):
 
+    ledger_model = ExpectedStamp
+
     @staticmethod
     def get_queryset():
         return ExpectedStamp.objects.select_related("sector")
@@ -45,12 +48,12 @@ class ExpectedStampService(BaseStampService):
         )
 
     @staticmethod
-    def grouped_by_sector(queryset):
-        return (
-            queryset.values("sector__name", "sector_id", "stamp_rate")
-            .annotate(total=Sum("d1"))
-            .order_by("-total")
-        )
+    def get_sector_balance(sector_id: int) -> Optional[SectorStampBalance]:
+        return LedgerService.get_balance(ExpectedStamp, sector_id)
+
+    @classmethod
+    def grouped_by_sector(cls):
+        return cls.entity_summaries()
 
     @staticmethod
     def get_number_of_invoice_copies(queryset, sector_id: int) -> int:
@@ -0,0 +1,259 @@
+import csv
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+import openpyxl
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from config import data_versions
+from stamps.services.ledger_service import LedgerService
+
+logger = logging.getLogger(__name__)
+
+
+class StampImportError(Exception):
+    pass
+
+
+class StampImportService:
+    """
+    Bulk ingestion of historical stamps.
+
+    Rows are streamed from CSV/XLSX, d1 and the running totals are computed
+    in memory per entity (seeded from the locked balance row), and records
+    are written with ``bulk_create`` — no per-row save() or signals.
+
+    Expected columns (header row, model field names):
+        company | sector, value_of_work, invoice_copies,
+        invoice_date (YYYY-MM-DD), stamp_rate, exchange_rate, note
+    """
+
+    DEFAULT_BATCH_SIZE = 1000
+    DEFAULT_STAMP_RATE = Decimal("0.0015")
+    DEFAULT_EXCHANGE_RATE = Decimal("1")
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def read_rows(cls, path):
+        """Yield (line_number, row_dict) from a CSV or XLSX file."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".csv":
+            yield from cls._read_csv(path)
+        elif ext in (".xlsx", ".xlsm"):
+            yield from cls._read_xlsx(path)
+        else:
+            raise StampImportError(f"Unsupported file type: {ext}")
+
+    @staticmethod
+    def _read_csv(path):
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                yield line, row
+
+    @staticmethod
+    def _read_xlsx(path):
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            headers = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+            for line, values in enumerate(rows, start=2):
+                if not any(v not in (None, "") for v in values):
+                    continue
+                yield line, dict(zip(headers, values))
+        finally:
+            wb.close()
+
+    # ------------------------------------------------------------------
+    # Parsing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _decimal(value, default=None):
+        if value in (None, ""):
+            if default is None:
+                raise StampImportError("missing number")
+            return default
+        try:
+            return Decimal(str(value).replace(",", "").strip())
+        except InvalidOperation:
+            raise StampImportError(f"invalid number {value!r}")
+
+    @staticmethod
+    def _date(value):
+        if value in (None, ""):
+            return None
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        parsed = parse_date(str(value).strip())
+        if parsed is None:
+            raise StampImportError(f"invalid date {value!r}")
+        return parsed
+
+    @classmethod
+    def parse_row(cls, model, row) -> tuple:
+        entity_name = str(row.get(model.LEDGER_ENTITY_FIELD) or "").strip()
+        if not entity_name:
+            raise StampImportError(f"missing {model.LEDGER_ENTITY_FIELD}")
+
+        try:
+            invoice_copies = int(cls._decimal(row.get("invoice_copies")))
+        except (TypeError, ValueError):
+            raise StampImportError("invalid invoice_copies")
+
+        values = {
+            "value_of_work": cls._decimal(row.get("value_of_work")),
+            "invoice_copies": invoice_copies,
+            "invoice_date": cls._date(row.get("invoice_date")),
+            "stamp_rate": cls._decimal(row.get("stamp_rate"), cls.DEFAULT_STAMP_RATE),
+            "exchange_rate": cls._decimal(
+                row.get("exchange_rate"), cls.DEFAULT_EXCHANGE_RATE
+            ),
+            "note": str(row.get("note") or "").strip() or None,
+        }
+        if values["exchange_rate"] <= 0 or invoice_copies < 0:
+            raise StampImportError("exchange_rate must be positive and invoice_copies >= 0")
+
+        places = model._meta.get_field("d1").decimal_places
+        values["d1"] = (
+            values["value_of_work"]
+            * values["invoice_copies"]
+            * values["stamp_rate"]
+            * values["exchange_rate"]
+        ).quantize(Decimal(1).scaleb(-places))
+
+        return entity_name, values
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _entity_resolver(model):
+        entity_model = model._meta.get_field(model.LEDGER_ENTITY_FIELD).related_model
+        known = {
+            name.lower(): pk for name, pk in entity_model.objects.values_list("name", "id")
+        }
+
+        def resolve(name):
+            key = name.lower()
+            if key not in known:
+                entity, _ = entity_model.objects.get_or_create(
+                    name__iexact=name, defaults={"name": name}
+                )
+                known[key] = entity.id
+            return known[key]
+
+        return resolve
+
+    @classmethod
+    def _flush(cls, model, user, batch) -> list:
+        """
+        Write one batch: lock the balances of the entities involved, assign
+        running totals in memory, bulk_create and move the balances (with
+        their summary fields) and yearly rollups forward.
+        """
+        entity_field = LedgerService.entity_field(model)
+
+        with transaction.atomic():
+            balances = {
+                entity_id: LedgerService.locked_balance(model, entity_id)
+                for entity_id in sorted({entity_id for entity_id, _ in batch})
+            }
+
+            objects = []
+            rollups = defaultdict(lambda: [Decimal("0"), 0, 0])
+            for entity_id, values in batch:
+                balance = balances[entity_id]
+                objects.append(
+                    model(
+                        **{entity_field: entity_id},
+                        user=user,
+                        total_past_years=balance.total_d1,
+                        total_stamp_for_company=balance.total_d1 + values["d1"],
+                        **values,
+                    )
+                )
+                balance.total_d1 += values["d1"]
+                balance.record_count += 1
+                balance.total_invoice_copies += values["invoice_copies"]
+                LedgerService.count_rate(balance, values["stamp_rate"], 1)
+                if values["invoice_date"] and (
+                    balance.last_invoice_date is None
+                    or values["invoice_date"] > balance.last_invoice_date
+                ):
+                    balance.last_invoice_date = values["invoice_date"]
+
+                if values["invoice_date"]:
+                    rollup = rollups[(entity_id, values["invoice_date"].year)]
+                    rollup[0] += values["d1"]
+                    rollup[1] += 1
+                    rollup[2] += values["invoice_copies"]
+
+            created = model.objects.bulk_create(objects)
+            LedgerService.balance_model(model).objects.bulk_update(
+                balances.values(),
+                LedgerService.BALANCE_FIELDS + LedgerService.SUMMARY_FIELDS,
+            )
+            for (entity_id, year), (d1, count, copies) in rollups.items():
+                LedgerService.adjust_rollup(model, entity_id, year, d1, count, copies)
+
+        return [obj.pk for obj in created]
+
+    @classmethod
+    def import_rows(cls, model, rows, user, batch_size: int | None = None) -> dict:
+        """
+        Ingest ``rows`` ((line, dict) pairs) into ``model``.
+
+        Returns the created ids, the touched entity ids and the rejected
+        lines with their error.
+        """
+        batch_size = batch_size or cls.DEFAULT_BATCH_SIZE
+        resolve = cls._entity_resolver(model)
+
+        created_ids = []
+        entity_ids = set()
+        errors = []
+        batch = []
+
+        for line, row in rows:
+            try:
+                entity_name, values = cls.parse_row(model, row)
+            except StampImportError as e:
+                errors.append((line, str(e)))
+                continue
+
+            entity_id = resolve(entity_name)
+            entity_ids.add(entity_id)
+            batch.append((entity_id, values))
+
+            if len(batch) >= batch_size:
+                created_ids += cls._flush(model, user, batch)
+                batch = []
+                logger.info(f"Imported {len(created_ids)} {model.__name__} rows so far")
+
+        if batch:
+            created_ids += cls._flush(model, user, batch)
+
+        if created_ids:
+            # bulk_create skips the post_save signals that normally do this
+            data_versions.bump(
+                *LedgerService.version_scopes(model, entity_ids, [user.pk])
+            )
+
+        return {"created_ids": created_ids, "entity_ids": sorted(entity_ids), "errors": errors}
+
+    @staticmethod
+    def verify(model, entity_ids) -> int:
+        """Repair pass over the touched entities; returns rows that drifted."""
+        return sum(
+            LedgerService.recompute(model, entity_id)["updated"] for entity_id in entity_ids
+        )
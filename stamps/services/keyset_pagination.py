@@ -0,0 +1,212 @@
+import base64
+import binascii
+import json
+import math
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+
+class KeysetPage:
+    """
+    One page of a KeysetPaginator. Mirrors the parts of Django's Page the
+    list templates use; the "page numbers" it hands out are cursor tokens.
+    """
+
+    def __init__(self, object_list, number, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<Keyset page {self.number}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over ``queryset`` ordered by one of the sort columns
+    allowed by BaseStampService.sort, with ``id`` as tie-breaker.
+
+    Each page is one ``WHERE (key) after/before cursor ORDER BY key LIMIT n+1``
+    query, so its cost does not grow with depth. ``count`` is optional (a
+    number or a callable, exact or approximate) and only feeds num_pages.
+    """
+
+    SORT_FIELDS = ("created_at", "invoice_date")
+    DEFAULT_SORT = "-created_at"
+
+    def __init__(self, queryset, per_page, count=None):
+        self.per_page = int(per_page)
+        self._count = count
+
+        sort = next(iter(queryset.query.order_by), self.DEFAULT_SORT)
+        if sort.lstrip("-") not in self.SORT_FIELDS:
+            sort = self.DEFAULT_SORT
+
+        self.sort = sort
+        self.field = sort.lstrip("-")
+        self.descending = sort.startswith("-")
+        self.model_field = queryset.model._meta.get_field(self.field)
+        self.queryset = queryset.order_by()
+
+    # ------------------------------------------------------------------
+    # Count
+    # ------------------------------------------------------------------
+
+    @property
+    def count(self):
+        if callable(self._count):
+            self._count = self._count()
+        return self._count
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, math.ceil(self.count / self.per_page))
+
+    # ------------------------------------------------------------------
+    # Cursor tokens
+    # ------------------------------------------------------------------
+
+    def encode(self, obj, direction, number) -> str:
+        value = getattr(obj, self.field)
+        payload = {
+            "s": self.sort,
+            "v": value.isoformat() if value is not None else None,
+            "id": obj.pk,
+            "d": direction,
+            "n": number,
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, token):
+        """Return the cursor dict, or None for the first page / a bad token."""
+        if not token or str(token) == "1":
+            return None
+        try:
+            token = str(token)
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            cursor = json.loads(raw)
+            if cursor.get("s") != self.sort:
+                # Issued under another sort order (e.g. the user changed ?sort=)
+                return None
+            cursor["v"] = self.model_field.to_python(cursor["v"])
+            cursor["id"] = int(cursor["id"])
+            cursor["n"] = max(1, int(cursor["n"]))
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError, ValidationError):
+            return None
+        if cursor.get("d") not in ("next", "prev"):
+            return None
+        return cursor
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def ordering(self, reverse=False):
+        descending = self.descending != reverse
+        if not self.model_field.null:
+            key = F(self.field).desc() if descending else F(self.field).asc()
+        # NULL sorts as the largest value, as Postgres does by default, so
+        # the plain (field, id) index still serves both directions
+        elif descending:
+            key = F(self.field).desc(nulls_first=True)
+        else:
+            key = F(self.field).asc(nulls_last=True)
+        return [key, F("id").desc() if descending else F("id").asc()]
+
+    def _seek(self, cursor, forward):
+        """Rows strictly after (forward) or before the cursor in page order."""
+        value, pk = cursor["v"], cursor["id"]
+        up = self.descending != forward
+        op = "gt" if up else "lt"
+
+        if value is None:
+            # Cursor is inside the NULL block, which sorts above every value
+            in_nulls = Q(**{f"{self.field}__isnull": True, f"id__{op}": pk})
+            if up:
+                return in_nulls
+            return Q(**{f"{self.field}__isnull": False}) | in_nulls
+
+        # The redundant inclusive bound lets the (field, id) index do a range scan
+        seek = Q(**{f"{self.field}__{op}e": value}) & (
+            Q(**{f"{self.field}__{op}": value}) | Q(**{f"id__{op}": pk})
+        )
+        if up and self.model_field.null:
+            seek |= Q(**{f"{self.field}__isnull": True})
+        return seek
+
+    def page(self, token=None) -> KeysetPage:
+        cursor = self.decode(token)
+        limit = self.per_page + 1
+
+        if cursor is None:
+            rows = list(self.queryset.order_by(*self.ordering())[:limit])
+            more, rows = len(rows) > self.per_page, rows[: self.per_page]
+            number = 1
+            has_previous = False
+            has_next = more
+        elif cursor["d"] == "next":
+            rows = list(
+                self.queryset.filter(self._seek(cursor, forward=True))
+                .order_by(*self.ordering())[:limit]
+            )
+            more, rows = len(rows) > self.per_page, rows[: self.per_page]
+            number = cursor["n"]
+            has_previous = number > 1
+            has_next = more
+        else:
+            rows = list(
+                self.queryset.filter(self._seek(cursor, forward=False))
+                .order_by(*self.ordering(reverse=True))[:limit]
+            )
+            more, rows = len(rows) > self.per_page, rows[: self.per_page][::-1]
+            # Rows inserted or deleted since the cursor was issued can make
+            # the carried page number drift; the real first page wins
+            number = cursor["n"] if more else 1
+            has_previous = more
+            has_next = True
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode(rows[-1], "next", number + 1)
+        if rows and has_previous:
+            previous_cursor = self.encode(rows[0], "prev", max(1, number - 1))
+
+        return KeysetPage(rows, number, self, next_cursor, previous_cursor)
@@ -0,0 +1,761 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, ExtractYear
+
+from config import data_versions
+
+logger = logging.getLogger(__name__)
+
+
+class _RecordMoved(Exception):
+    """A concurrent writer moved the record while its locks were being taken."""
+
+
+class LedgerService:
+    """
+    Running totals for the stamp ledgers (StampCalculation / ExpectedStamp).
+
+    A ledger is partitioned by the model's ``LEDGER_ENTITY_FIELD``
+    (company or sector) and ordered by (created_at, id). For every record:
+
+        total_past_years        = sum of d1 of all earlier records
+        total_stamp_for_company = total_past_years + d1
+    """
+
+    UPDATE_FIELDS = ["total_past_years", "total_stamp_for_company"]
+    BALANCE_FIELDS = ["total_d1", "record_count", "total_invoice_copies"]
+    # Kept on the balance rows only (not the rollups) for the grouped views
+    SUMMARY_FIELDS = ["last_invoice_date", "rate_counts", "dominant_rate"]
+    DEFAULT_CHUNK_SIZE = 1000
+
+    @staticmethod
+    def entity_field(model) -> str:
+        return f"{model.LEDGER_ENTITY_FIELD}_id"
+
+    @staticmethod
+    def balance_model(model):
+        return model._meta.apps.get_model(
+            model._meta.app_label, model.LEDGER_BALANCE_MODEL
+        )
+
+    @staticmethod
+    def rollup_model(model):
+        return model._meta.apps.get_model(model._meta.app_label, "StampYearlyRollup")
+
+    @staticmethod
+    def version_scopes(model, entity_ids=(), user_ids=()) -> list:
+        """Data-version scopes a write to these entities'/users' rows changes."""
+        return [
+            data_versions.LEDGER,
+            *(data_versions.scope(model.LEDGER_ENTITY_FIELD, entity_id) for entity_id in entity_ids),
+            *(data_versions.scope(data_versions.USER, user_id) for user_id in user_ids),
+        ]
+
+    @staticmethod
+    def ordering():
+        return [F("created_at").asc(), F("id").asc()]
+
+    @classmethod
+    def running_totals(cls, model, entity_id):
+        """
+        One ordered query returning (id, d1, total_past_years,
+        total_stamp_for_company, running_total) for every record of the entity.
+        ``running_total`` includes the record's own d1.
+        """
+        entity_field = cls.entity_field(model)
+        d1 = Coalesce(
+            "d1",
+            Value(Decimal("0")),
+            output_field=DecimalField(max_digits=19, decimal_places=0),
+        )
+
+        return (
+            model.objects.filter(**{entity_field: entity_id})
+            .annotate(
+                running_total=Window(
+                    Sum(d1),
+                    partition_by=[F(entity_field)],
+                    order_by=cls.ordering(),
+                )
+            )
+            .order_by("created_at", "id")
+            .values_list(
+                "id",
+                "d1",
+                "total_past_years",
+                "total_stamp_for_company",
+                "running_total",
+            )
+        )
+
+    @classmethod
+    def recompute(
+        cls, model, entity_id, chunk_size: int | None = None, dry_run: bool = False
+    ) -> dict:
+        """
+        Rebuild the running totals of one entity in a single pass, then its
+        balance row and yearly rollups (writes that bypassed the signals,
+        like fixture loads, leave all three behind).
+
+        Only records whose stored totals differ from the computed ones are
+        written, in bulk updates of ``chunk_size`` rows. The entity's balance
+        row is locked for the whole pass, so appends wait instead of
+        interleaving. With ``dry_run`` the drift is reported but not fixed.
+        """
+        chunk_size = chunk_size or cls.DEFAULT_CHUNK_SIZE
+
+        scanned = 0
+        changed_ids = []
+        pending = []
+
+        with transaction.atomic():
+            cls.locked_balance(model, entity_id)
+            rows = cls.running_totals(model, entity_id).iterator(chunk_size=chunk_size)
+
+            for pk, d1, past, total, running_total in rows:
+                scanned += 1
+                expected_past = running_total - (d1 or 0)
+
+                if past != expected_past or total != running_total:
+                    changed_ids.append(pk)
+                    if not dry_run:
+                        pending.append(
+                            model(
+                                pk=pk,
+                                total_past_years=expected_past,
+                                total_stamp_for_company=running_total,
+                            )
+                        )
+
+                if len(pending) >= chunk_size:
+                    model.objects.bulk_update(pending, cls.UPDATE_FIELDS)
+                    pending = []
+
+            if pending:
+                model.objects.bulk_update(pending, cls.UPDATE_FIELDS)
+
+            balance_drift = cls.rebuild_balances(model, dry_run, entity_ids=[entity_id])
+            rollup_drift = cls.rebuild_rollups(model, dry_run, entity_ids=[entity_id])
+
+            if not dry_run and (changed_ids or balance_drift or rollup_drift):
+                user_ids = (
+                    model.objects.filter(pk__in=changed_ids)
+                    .values_list("user_id", flat=True)
+                    .distinct()
+                )
+                data_versions.bump_on_commit(
+                    *cls.version_scopes(model, [entity_id], set(user_ids))
+                )
+
+        logger.info(
+            f"Recomputed {model.__name__} ledger for {model.LEDGER_ENTITY_FIELD} "
+            f"{entity_id}: scanned {scanned}, "
+            f"{'drifted' if dry_run else 'updated'} {len(changed_ids)}, "
+            f"balance {'drifted' if balance_drift else 'ok'}, "
+            f"{len(rollup_drift)} rollup years drifted"
+        )
+        return {
+            "scanned": scanned,
+            "updated": len(changed_ids),
+            "changed_ids": changed_ids,
+            "balance_drift": bool(balance_drift),
+            "rollup_drift": rollup_drift,
+        }
+
+    @classmethod
+    def total_before(cls, model, entity_id, created_at, pk) -> Decimal:
+        """Sum of d1 of the entity's records ordered before (created_at, pk)."""
+        total = (
+            model.objects.filter(**{cls.entity_field(model): entity_id})
+            .filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+            .aggregate(total=Sum("d1"))["total"]
+        )
+        return total or Decimal("0")
+
+    # ------------------------------------------------------------------
+    # Balances (CompanyStampBalance / SectorStampBalance)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def entity_totals(cls, model, entity_id) -> dict:
+        totals = model.objects.filter(
+            **{cls.entity_field(model): entity_id}
+        ).aggregate(
+            total_d1=Sum("d1"),
+            record_count=Count("id"),
+            total_invoice_copies=Sum("invoice_copies"),
+        )
+        return {
+            "total_d1": totals["total_d1"] or Decimal("0"),
+            "record_count": totals["record_count"] or 0,
+            "total_invoice_copies": totals["total_invoice_copies"] or 0,
+            **cls.entity_summary(model, entity_id),
+        }
+
+    @classmethod
+    def entity_summary(cls, model, entity_id) -> dict:
+        """Last invoice date and records per stamp rate of one entity, from the ledger."""
+        rows = (
+            model.objects.filter(**{cls.entity_field(model): entity_id})
+            .order_by()
+            .values("stamp_rate")
+            .annotate(record_count=Count("id"), last_invoice_date=Max("invoice_date"))
+        )
+        return cls._summary(rows)
+
+    @classmethod
+    def _summary(cls, rows) -> dict:
+        """SUMMARY_FIELDS from (stamp_rate, record_count, last_invoice_date) rows."""
+        rate_counts = {}
+        last_invoice_date = None
+        for row in rows:
+            key = cls.rate_key(row["stamp_rate"])
+            rate_counts[key] = rate_counts.get(key, 0) + row["record_count"]
+            if row["last_invoice_date"] and (
+                last_invoice_date is None or row["last_invoice_date"] > last_invoice_date
+            ):
+                last_invoice_date = row["last_invoice_date"]
+        return {
+            "last_invoice_date": last_invoice_date,
+            "rate_counts": rate_counts,
+            "dominant_rate": cls.dominant_rate(rate_counts),
+        }
+
+    @staticmethod
+    def rate_key(rate) -> str:
+        """rate_counts key of a stamp rate, at the column's 4 decimal places."""
+        return str(Decimal(str(rate)).quantize(Decimal("0.0001")))
+
+    @staticmethod
+    def dominant_rate(rate_counts: dict):
+        """The rate with the most records (the higher rate on a tie), or None."""
+        if not rate_counts:
+            return None
+        _, rate = max((count, Decimal(rate)) for rate, count in rate_counts.items())
+        return rate
+
+    @classmethod
+    def count_rate(cls, balance, rate, count: int):
+        """Move ``count`` records of ``rate`` in a balance's rate_counts, in memory."""
+        rate_counts = dict(balance.rate_counts or {})
+        key = cls.rate_key(rate)
+        rate_counts[key] = rate_counts.get(key, 0) + count
+        if rate_counts[key] <= 0:
+            del rate_counts[key]
+        balance.rate_counts = rate_counts
+        balance.dominant_rate = cls.dominant_rate(rate_counts)
+
+    @classmethod
+    def get_balance(cls, model, entity_id):
+        return (
+            cls.balance_model(model)
+            .objects.filter(**{cls.entity_field(model): entity_id})
+            .first()
+        )
+
+    @classmethod
+    def locked_balance(cls, model, entity_id):
+        """
+        Return the entity's balance row locked FOR UPDATE, creating it from
+        the ledger on first use. Must run inside a transaction.
+        """
+        balance_model = cls.balance_model(model)
+        lookup = {cls.entity_field(model): entity_id}
+
+        balance = balance_model.objects.select_for_update().filter(**lookup).first()
+        if balance is None:
+            balance, _ = balance_model.objects.get_or_create(
+                **lookup, defaults=cls.entity_totals(model, entity_id)
+            )
+            balance = balance_model.objects.select_for_update().get(pk=balance.pk)
+        return balance
+
+    @classmethod
+    def adjust_balance(cls, model, entity_id, d1=0, count=0, copies=0):
+        if not (d1 or count or copies):
+            return
+        cls.balance_model(model).objects.filter(
+            **{cls.entity_field(model): entity_id}
+        ).update(
+            total_d1=F("total_d1") + d1,
+            record_count=F("record_count") + count,
+            total_invoice_copies=F("total_invoice_copies") + copies,
+        )
+
+    @classmethod
+    def adjust_summary(cls, model, entity_id, invoice_date, rate, count=0):
+        """
+        Add (count > 0) or remove (count < 0) records of ``rate`` dated
+        ``invoice_date`` from the entity's last invoice date and rate counts.
+        Runs after the ledger row was written, so removing the latest
+        invoice can re-read the new maximum from the (entity, invoice_date)
+        index.
+        """
+        if not count:
+            return
+
+        entity_field = cls.entity_field(model)
+        balance = (
+            cls.balance_model(model)
+            .objects.select_for_update()
+            .filter(**{entity_field: entity_id})
+            .first()
+        )
+        if balance is None:
+            return
+
+        cls.count_rate(balance, rate, count)
+        if count > 0:
+            if invoice_date and (
+                balance.last_invoice_date is None or invoice_date > balance.last_invoice_date
+            ):
+                balance.last_invoice_date = invoice_date
+        elif invoice_date and invoice_date == balance.last_invoice_date:
+            balance.last_invoice_date = model.objects.filter(
+                **{entity_field: entity_id}
+            ).aggregate(last=Max("invoice_date"))["last"]
+
+        balance.save(update_fields=cls.SUMMARY_FIELDS)
+
+    @classmethod
+    def rebuild_balances(cls, model, dry_run: bool = False, entity_ids=None) -> list:
+        """
+        Recompute every balance of ``model`` (or only those of ``entity_ids``)
+        from the ledger with one grouped query. Returns the ids of entities
+        whose stored balance was wrong; with ``dry_run`` nothing is written
+        (verification only).
+        """
+        entity_field = cls.entity_field(model)
+        balance_model = cls.balance_model(model)
+        only = {} if entity_ids is None else {f"{entity_field}__in": list(entity_ids)}
+        fields = cls.BALANCE_FIELDS + cls.SUMMARY_FIELDS
+        zero = {
+            "total_d1": Decimal("0"),
+            "record_count": 0,
+            "total_invoice_copies": 0,
+            **cls._summary([]),
+        }
+
+        with transaction.atomic():
+            actual = {
+                row[entity_field]: {
+                    "total_d1": row["total_d1"] or Decimal("0"),
+                    "record_count": row["record_count"],
+                    "total_invoice_copies": row["total_invoice_copies"] or 0,
+                }
+                for row in model.objects.filter(**only)
+                .order_by()
+                .values(entity_field)
+                .annotate(
+                    total_d1=Sum("d1"),
+                    record_count=Count("id"),
+                    total_invoice_copies=Sum("invoice_copies"),
+                )
+            }
+            rate_rows = defaultdict(list)
+            for row in (
+                model.objects.filter(**only)
+                .order_by()
+                .values(entity_field, "stamp_rate")
+                .annotate(record_count=Count("id"), last_invoice_date=Max("invoice_date"))
+            ):
+                rate_rows[row[entity_field]].append(row)
+            for entity_id, totals in actual.items():
+                totals.update(cls._summary(rate_rows[entity_id]))
+
+            stored = {
+                getattr(balance, entity_field): balance
+                for balance in balance_model.objects.select_for_update().filter(**only)
+            }
+
+            mismatched = []
+            to_create = []
+            to_update = []
+
+            for entity_id in actual.keys() | stored.keys():
+                expected = actual.get(entity_id, zero)
+                balance = stored.get(entity_id)
+
+                if balance is None:
+                    mismatched.append(entity_id)
+                    to_create.append(balance_model(**{entity_field: entity_id}, **expected))
+                elif any(getattr(balance, f) != expected[f] for f in fields):
+                    mismatched.append(entity_id)
+                    for field, value in expected.items():
+                        setattr(balance, field, value)
+                    to_update.append(balance)
+
+            if not dry_run:
+                balance_model.objects.bulk_create(to_create, batch_size=cls.DEFAULT_CHUNK_SIZE)
+                balance_model.objects.bulk_update(
+                    to_update, fields, batch_size=cls.DEFAULT_CHUNK_SIZE
+                )
+
+        return sorted(mismatched)
+
+    # ------------------------------------------------------------------
+    # Yearly rollups (StampYearlyRollup)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def adjust_rollup(cls, model, entity_id, year, d1=0, count=0, copies=0):
+        """Move one (entity, year) rollup row; records without invoice_date are not rolled up."""
+        if year is None or not (d1 or count or copies):
+            return
+
+        rollup_model = cls.rollup_model(model)
+        lookup = {cls.entity_field(model): entity_id, "year": year}
+        updated = rollup_model.objects.filter(**lookup).update(
+            total_d1=F("total_d1") + d1,
+            record_count=F("record_count") + count,
+            total_invoice_copies=F("total_invoice_copies") + copies,
+        )
+        if not updated and count > 0:
+            rollup_model.objects.create(
+                **lookup, total_d1=d1, record_count=count, total_invoice_copies=copies
+            )
+        elif count < 0:
+            rollup_model.objects.filter(**lookup, record_count=0).delete()
+
+    @classmethod
+    def yearly_totals(cls, model, year: int | None = None) -> dict:
+        """{year: total d1} across every entity of ``model``, read from the rollups."""
+        rollups = cls.rollup_model(model).objects.filter(
+            **{f"{cls.entity_field(model)}__isnull": False}
+        )
+        if year is not None:
+            rollups = rollups.filter(year=year)
+
+        return {
+            row["year"]: row["total"]
+            for row in rollups.values("year")
+            .annotate(total=Sum("total_d1"))
+            .order_by("year")
+        }
+
+    @classmethod
+    def ledger_totals(cls, model) -> dict:
+        """Sum of d1 and record count over the whole ledger, read from the balance rows."""
+        totals = cls.balance_model(model).objects.aggregate(
+            total_d1=Sum("total_d1"), record_count=Sum("record_count")
+        )
+        return {
+            "total_d1": totals["total_d1"] or Decimal("0"),
+            "record_count": totals["record_count"] or 0,
+        }
+
+    @classmethod
+    def ledger_total(cls, model) -> Decimal:
+        return cls.ledger_totals(model)["total_d1"]
+
+    @classmethod
+    def rebuild_rollups(cls, model, dry_run: bool = False, entity_ids=None) -> list:
+        """
+        Recompute every yearly rollup of ``model`` (or only those of
+        ``entity_ids``) from the ledger with one grouped query. Returns the
+        (entity id, year) pairs that were wrong; with ``dry_run`` nothing is
+        written.
+        """
+        entity_field = cls.entity_field(model)
+        rollup_model = cls.rollup_model(model)
+        only = (
+            {f"{entity_field}__isnull": False}
+            if entity_ids is None
+            else {f"{entity_field}__in": list(entity_ids)}
+        )
+
+        with transaction.atomic():
+            actual = {
+                (row[entity_field], row["year"]): {
+                    "total_d1": row["total_d1"] or Decimal("0"),
+                    "record_count": row["record_count"],
+                    "total_invoice_copies": row["total_invoice_copies"] or 0,
+                }
+                for row in model.objects.filter(invoice_date__isnull=False, **only)
+                .annotate(year=ExtractYear("invoice_date"))
+                .order_by()
+                .values(entity_field, "year")
+                .annotate(
+                    total_d1=Sum("d1"),
+                    record_count=Count("id"),
+                    total_invoice_copies=Sum("invoice_copies"),
+                )
+            }
+            stored = {
+                (getattr(rollup, entity_field), rollup.year): rollup
+                for rollup in rollup_model.objects.select_for_update().filter(**only)
+            }
+
+            mismatched = []
+            to_create = []
+            to_update = []
+            to_delete = []
+
+            for key in actual.keys() | stored.keys():
+                expected = actual.get(key)
+                rollup = stored.get(key)
+
+                if expected is None:
+                    mismatched.append(key)
+                    to_delete.append(rollup.pk)
+                elif rollup is None:
+                    mismatched.append(key)
+                    to_create.append(
+                        rollup_model(**{entity_field: key[0]}, year=key[1], **expected)
+                    )
+                elif any(getattr(rollup, f) != expected[f] for f in cls.BALANCE_FIELDS):
+                    mismatched.append(key)
+                    for field, value in expected.items():
+                        setattr(rollup, field, value)
+                    to_update.append(rollup)
+
+            if not dry_run:
+                rollup_model.objects.filter(pk__in=to_delete).delete()
+                rollup_model.objects.bulk_create(to_create, batch_size=cls.DEFAULT_CHUNK_SIZE)
+                rollup_model.objects.bulk_update(
+                    to_update, cls.BALANCE_FIELDS, batch_size=cls.DEFAULT_CHUNK_SIZE
+                )
+
+        return sorted(mismatched)
+
+    # ------------------------------------------------------------------
+    # Write path
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def locked_balances(cls, model, entity_ids, create: bool = True) -> dict:
+        """
+        Lock the balance rows of ``entity_ids`` in ascending entity order.
+        With ``create=False`` missing rows are skipped rather than created.
+        """
+        if create:
+            return {
+                entity_id: cls.locked_balance(model, entity_id)
+                for entity_id in sorted(entity_ids)
+            }
+
+        entity_field = cls.entity_field(model)
+        balances = (
+            cls.balance_model(model)
+            .objects.select_for_update()
+            .filter(**{f"{entity_field}__in": entity_ids})
+            .order_by(entity_field)
+        )
+        return {getattr(balance, entity_field): balance for balance in balances}
+
+    @classmethod
+    def lock_record(cls, model, pk, entity_ids=(), create_balances: bool = True):
+        """
+        Lock the balance rows of ``entity_ids`` and of the record's stored
+        entity, then the stored record itself. Returns (balances by entity
+        id, stored ledger fields or None if the record is gone).
+
+        Balances always come first and in ascending entity order: a writer
+        shifting this record holds its entity's balance lock while it
+        updates it. If a concurrent move takes the record to an entity that
+        is not locked yet, the savepoint is rolled back, which releases its
+        locks, and they are taken again in order.
+        """
+        entity_field = cls.entity_field(model)
+        while True:
+            wanted = set(entity_ids)
+            wanted.update(model.objects.filter(pk=pk).values_list(entity_field, flat=True))
+            try:
+                with transaction.atomic():
+                    balances = cls.locked_balances(model, wanted, create=create_balances)
+                    stored = (
+                        model.objects.select_for_update()
+                        .filter(pk=pk)
+                        .values(
+                            entity_field,
+                            "user_id",
+                            "d1",
+                            "stamp_rate",
+                            "invoice_copies",
+                            "invoice_date",
+                            "total_past_years",
+                            "created_at",
+                        )
+                        .first()
+                    )
+                    if stored is not None and stored[entity_field] not in wanted:
+                        raise _RecordMoved
+                return balances, stored
+            except _RecordMoved:
+                logger.info(f"{model.__name__} {pk} moved while locking, retrying")
+
+    @classmethod
+    def prepare_save(cls, instance):
+        """
+        Fill total_past_years / total_stamp_for_company before a save and
+        remember the stored row so post_save can propagate the change.
+        Must run inside the transaction that saves the instance.
+        """
+        model = type(instance)
+        entity_field = cls.entity_field(model)
+        entity_id = getattr(instance, entity_field)
+
+        if instance.d1 is not None:
+            # Round like the column does, so deltas match what is stored
+            places = model._meta.get_field("d1").decimal_places
+            instance.d1 = instance.d1.quantize(Decimal(1).scaleb(-places))
+
+        # Serialize writers per entity: lock the balance rows involved, always
+        # in ascending entity order so a move between two entities cannot
+        # deadlock with a move in the opposite direction.
+        if instance.pk:
+            balances, previous = cls.lock_record(model, instance.pk, {entity_id})
+        else:
+            balances, previous = cls.locked_balances(model, {entity_id}), None
+        instance._ledger_previous = previous
+
+        if previous is None:
+            # New record → appended after everything already in the ledger
+            past_total = balances[entity_id].total_d1
+        elif previous[entity_field] == entity_id:
+            # Earlier records are untouched, so the prefix sum is unchanged
+            past_total = previous["total_past_years"]
+        else:
+            # Moved to another entity → slot it in by its original position
+            past_total = cls.total_before(
+                model, entity_id, previous["created_at"], instance.pk
+            )
+
+        instance.total_past_years = past_total
+        instance.total_stamp_for_company = (instance.d1 or 0) + past_total
+
+    @classmethod
+    def shift_following(cls, model, entity_id, created_at, pk, delta) -> list:
+        """
+        Add ``delta`` to the totals of every record ordered after
+        (created_at, pk) with one set-based UPDATE. Returns the shifted ids.
+        """
+        if not delta:
+            return []
+
+        following = model.objects.filter(
+            **{cls.entity_field(model): entity_id}
+        ).filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+
+        shifted_ids = list(following.values_list("id", flat=True))
+        if shifted_ids:
+            following.update(
+                total_past_years=F("total_past_years") + delta,
+                total_stamp_for_company=F("total_stamp_for_company") + delta,
+            )
+        return shifted_ids
+
+    @classmethod
+    def _apply(cls, model, entity_id, invoice_date, d1, count, copies, rate):
+        cls.adjust_balance(model, entity_id, d1, count, copies)
+        cls.adjust_summary(model, entity_id, invoice_date, rate, count)
+        cls.adjust_rollup(
+            model, entity_id, invoice_date.year if invoice_date else None, d1, count, copies
+        )
+
+    @classmethod
+    def propagate_save(cls, instance, created: bool) -> list:
+        """
+        Apply a saved record to its entity balance and yearly rollup, and
+        shift the records after it by the d1 delta. Returns the shifted ids.
+        """
+        model = type(instance)
+        entity_field = cls.entity_field(model)
+        entity_id = getattr(instance, entity_field)
+        previous = getattr(instance, "_ledger_previous", None)
+        new_d1 = instance.d1 or 0
+
+        if created or previous is None:
+            cls._apply(
+                model,
+                entity_id,
+                instance.invoice_date,
+                new_d1,
+                1,
+                instance.invoice_copies,
+                instance.stamp_rate,
+            )
+            return []
+
+        created_at = previous["created_at"]
+        old_d1 = previous["d1"] or 0
+
+        cls._apply(
+            model,
+            previous[entity_field],
+            previous["invoice_date"],
+            -old_d1,
+            -1,
+            -previous["invoice_copies"],
+            previous["stamp_rate"],
+        )
+        cls._apply(
+            model,
+            entity_id,
+            instance.invoice_date,
+            new_d1,
+            1,
+            instance.invoice_copies,
+            instance.stamp_rate,
+        )
+
+        if previous[entity_field] == entity_id:
+            return cls.shift_following(
+                model, entity_id, created_at, instance.pk, new_d1 - old_d1
+            )
+
+        return cls.shift_following(
+            model, previous[entity_field], created_at, instance.pk, -old_d1
+        ) + cls.shift_following(model, entity_id, created_at, instance.pk, new_d1)
+
+    @classmethod
+    def prepare_delete(cls, instance):
+        """
+        Lock the entity balance and then the stored row before a delete, and
+        load the stored ledger fields into the instance so post_delete takes
+        out what the table holds rather than a stale copy.
+        Must run inside the transaction that deletes the instance.
+        """
+        model = type(instance)
+        entity_field = cls.entity_field(model)
+
+        # Existing balance rows only: a cascade from the entity deletes them too
+        _, stored = cls.lock_record(model, instance.pk, create_balances=False)
+        instance._ledger_gone = stored is None
+        if stored is None:
+            return
+
+        setattr(instance, entity_field, stored[entity_field])
+        for field in ("user_id", "d1", "stamp_rate", "invoice_copies", "invoice_date", "created_at"):
+            setattr(instance, field, stored[field])
+
+    @classmethod
+    def propagate_delete(cls, instance) -> list:
+        """
+        Remove a deleted record from its entity balance, its yearly rollup
+        and the records after it. Returns the shifted ids.
+        """
+        if getattr(instance, "_ledger_gone", False):
+            # Already deleted by a concurrent writer
+            return []
+
+        model = type(instance)
+        entity_id = getattr(instance, cls.entity_field(model))
+        d1 = instance.d1 or 0
+
+        cls._apply(
+            model,
+            entity_id,
+            instance.invoice_date,
+            -d1,
+            -1,
+            -instance.invoice_copies,
+            instance.stamp_rate,
+        )
+        return cls.shift_following(
+            model, entity_id, instance.created_at, instance.pk, -d1
+        )
@@ -1,32 +1,38 @@
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
 from django.utils import timezone
 from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
 from typing import Optional
 from datetime import timedelta
-from django.db.models import Sum, Q
-from django.db.models.functions import TruncYear
-from site_settings.models import SiteConfiguration
+from django.db.models import Count, Sum, Q
+from site_settings.services.site_settings_cache import SiteSettingsCache
 from stamps.admin import format_millions
+from stamps.services.chart_service import YearlyChartService
+from stamps.services.ledger_service import LedgerService
 
 
 class BaseStampService:
 
     PREVIOUS_YEAR_MULTIPLIER = Decimal("0.7")
     PENSION_MULTIPLIER = Decimal("0.2")
+    PREVIOUS_YEAR_SHARE = Decimal("0.3")
     MONTHS_PER_YEAR = 12
 
-    def __init__(self, retired_engineers: Optional[int] = None):
-        if retired_engineers is None:
-            config = SiteConfiguration.objects.only(
-                "number_of_retired_engineers"
-            ).first()
-            retired_engineers = (
-                getattr(config, "number_of_retired_engineers", 0) if config else 0
-            )
+    # Ledger model served by the subclass; unfiltered querysets of it are
+    # answered from the balance / yearly rollup tables instead of the ledger.
+    ledger_model = None
 
-        self.retired_engineers = retired_engineers or 0
+    def __init__(self, retired_engineers: Optional[int] = None):
+        if retired_engineers is not None:
+            self.retired_engineers = retired_engineers or 0
         self.current_year = timezone.now().year
 
+    @cached_property
+    def retired_engineers(self) -> int:
+        # Read lazily: most pages build a service without ever needing it
+        config = SiteSettingsCache.configuration()
+        return (getattr(config, "number_of_retired_engineers", 0) if config else 0) or 0
+
     @staticmethod
     def get_last_year(date_to):
         from datetime import datetime
@@ -95,19 +101,41 @@ class BaseStampService:
         allowed_sorts = ["invoice_date", "-invoice_date", "created_at", "-created_at"]
         return queryset.order_by(sort if sort in allowed_sorts else "-created_at")
 
-    @staticmethod
-    def total_amount(queryset) -> Decimal:
+    @classmethod
+    def uses_rollup(cls, queryset) -> bool:
+        """True when ``queryset`` is the whole ledger, so the summary tables can answer."""
+        return (
+            cls.ledger_model is not None
+            and queryset.model is cls.ledger_model
+            and not queryset.query.where
+            and not queryset.query.is_sliced
+        )
+
+    @classmethod
+    def total_amount(cls, queryset) -> Decimal:
+        if cls.uses_rollup(queryset):
+            return LedgerService.ledger_total(cls.ledger_model)
+
         result = queryset.aggregate(total=Sum("d1"))["total"]
         return Decimal(str(result)) if result else Decimal("0")
 
+    @classmethod
+    def total_for_year(cls, queryset, year: int) -> Decimal:
+        if cls.uses_rollup(queryset):
+            total = LedgerService.yearly_totals(cls.ledger_model, year).get(year)
+        else:
+            total = queryset.filter(invoice_date__year=year).aggregate(
+                total=Sum("d1")
+            )["total"]
+        return Decimal(str(total)) if total else Decimal("0")
+
     def _total_for_previous_year(
         self, queryset, current_year: Optional[int] = None
     ) -> Decimal:
         year = current_year if current_year is not None else self.current_year
         previous_year = year - 1
 
-        stamps = queryset.filter(invoice_date__year=previous_year)
-        total = stamps.aggregate(total=Sum("d1"))["total"]
+        total = self.total_for_year(queryset, previous_year)
 
         if not total:
             return Decimal("0")
@@ -118,13 +146,12 @@ class BaseStampService:
         year = self.current_year
         previous_year = year - 1
 
-        stamps = queryset.filter(invoice_date__year=previous_year)
-        total = stamps.aggregate(total=Sum("d1"))["total"]
+        total = self.total_for_year(queryset, previous_year)
 
         if not total:
             return Decimal("0")
 
-        return Decimal(str(total)) * Decimal("0.3")
+        return Decimal(str(total)) * self.PREVIOUS_YEAR_SHARE
 
     def calculate_pension(
         self,
@@ -138,12 +165,16 @@ class BaseStampService:
         if not self.retired_engineers or self.retired_engineers <= 0:
             return Decimal("0.00")
 
-        try:
-            current_total = self.total_amount(queryset) or Decimal("0")
-            previous_total = self._total_for_previous_year(queryset, year) or Decimal(
-                "0"
-            )
+        current_total = self.total_amount(queryset) or Decimal("0")
+        previous_total = self._total_for_previous_year(queryset, year) or Decimal("0")
+
+        return self._pension_from_totals(current_total, previous_total)
 
+    def _pension_from_totals(self, current_total, previous_total) -> Decimal:
+        if not self.retired_engineers or self.retired_engineers <= 0:
+            return Decimal("0.00")
+
+        try:
             denominator = Decimal(self.retired_engineers) * Decimal(
                 self.MONTHS_PER_YEAR
             )
@@ -157,6 +188,48 @@ class BaseStampService:
         except (InvalidOperation, ZeroDivisionError, TypeError):
             return Decimal("0.00")
 
+    def summarize(self, queryset, year: Optional[int] = None) -> dict:
+        """
+        Everything the list views show for ``queryset`` from one conditional
+        aggregation: total, row count, the previous-year total the pension
+        uses (relative to ``year``), the 30% share of last year and the
+        pension itself.
+        """
+        year = year or self.current_year
+        pension_year = year - 1
+        last_year = self.current_year - 1
+
+        if self.uses_rollup(queryset):
+            totals = LedgerService.ledger_totals(self.ledger_model)
+            yearly = LedgerService.yearly_totals(self.ledger_model)
+            result = {
+                "total": totals["total_d1"],
+                "count": totals["record_count"],
+                "pension_year_total": yearly.get(pension_year),
+                "last_year_total": yearly.get(last_year),
+            }
+        else:
+            result = queryset.aggregate(
+                total=Sum("d1"),
+                count=Count("id"),
+                pension_year_total=Sum("d1", filter=Q(invoice_date__year=pension_year)),
+                last_year_total=Sum("d1", filter=Q(invoice_date__year=last_year)),
+            )
+
+        total, pension_year_total, last_year_total = (
+            Decimal(str(result[key])) if result[key] else Decimal("0")
+            for key in ("total", "pension_year_total", "last_year_total")
+        )
+        previous_total = pension_year_total * self.PREVIOUS_YEAR_MULTIPLIER
+
+        return {
+            "total": total,
+            "count": result["count"] or 0,
+            "previous_year_total": pension_year_total,
+            "30_previous_year": last_year_total * self.PREVIOUS_YEAR_SHARE,
+            "pension": self._pension_from_totals(total, previous_total),
+        }
+
     @staticmethod
     def get_number_of_invoice_copies(
         queryset, entity_id: int, entity_field: str
@@ -167,39 +240,27 @@ class BaseStampService:
         )["total_copies"]
         return result if result else 0
 
-    @staticmethod
-    def yearly_chart(queryset):
-        stamps = (
-            queryset.filter(invoice_date__isnull=False)
-            .annotate(year=TruncYear("invoice_date"))
-            .values("year")
-            .annotate(total=Sum("d1"))
-            .order_by("year")
-        )
-
-        categories = []
-        yearly = []
-        cumulative = []
-
-        running_total = 0
-
-        for item in stamps:
-            year = item["year"].strftime("%Y")
-            value = round(float(item["total"]), 2)
-
-            categories.append(year)
-            yearly.append(value)
-
-            running_total += value
-            cumulative.append(round(running_total, 2))
-
-        yearly = [format_millions(v) for v in yearly]
-        cumulative = [format_millions(v) for v in cumulative]
+    @classmethod
+    def yearly_chart(cls, queryset, top: int = 0):
+        """
+        Chart series in millions: yearly and cumulative totals and, with
+        ``top``, the same series for the largest companies/sectors.
+        """
+        chart = YearlyChartService.fetch(cls, queryset, top)
 
         return {
-            "categories": categories,
-            "yearly": yearly,
-            "cumulative": cumulative,
+            "categories": [str(year) for year in chart["categories"]],
+            "yearly": [format_millions(v) for v in chart["yearly"]],
+            "cumulative": [format_millions(v) for v in chart["cumulative"]],
+            "breakdown": [
+                {
+                    "id": entity["id"],
+                    "name": entity["name"],
+                    "yearly": [format_millions(v) for v in entity["yearly"]],
+                    "cumulative": [format_millions(v) for v in entity["cumulative"]],
+                }
+                for entity in chart["breakdown"]
+            ],
         }
 
     @staticmethod
@@ -208,6 +269,38 @@ class BaseStampService:
         result = queryset.filter(**filter_kwargs).aggregate(total=Sum("d1"))["total"]
         return Decimal(str(result)) if result else Decimal("0")
 
+    @classmethod
+    def entity_summaries(cls):
+        """
+        One row per company/sector with records, from the maintained balance
+        table, largest total first (served by the partial total index).
+        """
+        entity = cls.ledger_model.LEDGER_ENTITY_FIELD
+        return (
+            LedgerService.balance_model(cls.ledger_model)
+            .objects.filter(record_count__gt=0)
+            .order_by("-total_d1", "id")
+            .values(
+                f"{entity}_id",
+                f"{entity}__name",
+                "total_d1",
+                "record_count",
+                "total_invoice_copies",
+                "last_invoice_date",
+                "dominant_rate",
+            )
+        )
+
+    @classmethod
+    def entity_summary_totals(cls) -> dict:
+        """Grand total and number of companies/sectors of the grouped views."""
+        totals = (
+            LedgerService.balance_model(cls.ledger_model)
+            .objects.filter(record_count__gt=0)
+            .aggregate(total=Sum("total_d1"), entities=Count("id"))
+        )
+        return {"total": totals["total"] or Decimal("0"), "entities": totals["entities"]}
+
     @staticmethod
     def total_entities(queryset, entity_field: str) -> int:
         return queryset.values(entity_field).distinct().count()
@@ -0,0 +1,56 @@
+import logging
+
+from django.utils import timezone
+
+from config import data_versions
+from config.cache import cache_key, get_or_compute
+from stamps.services.stamp.stamp_service import StampService
+
+logger = logging.getLogger(__name__)
+
+
+class PensionSnapshotService:
+    """
+    The site-wide pension figure rendered on every page.
+
+    It is computed once per data version and then served from the cache.
+    Stamp writes and SiteConfiguration changes bump the ledger and site
+    config versions (after commit), so the next read recomputes it.
+    """
+
+    # The figure depends on every StampCalculation and on SiteConfiguration
+    # (number_of_retired_engineers)
+    SCOPES = (data_versions.LEDGER, data_versions.SITE_CONFIG)
+    SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+    @classmethod
+    def version(cls) -> str:
+        return data_versions.version_tag(*cls.SCOPES)
+
+    @staticmethod
+    def compute(year: int) -> dict:
+        service = StampService()
+        return {
+            "year": year,
+            "retired_engineers": service.retired_engineers,
+            "total_pension": service.calculate_pension(service.get_queryset(), year),
+        }
+
+    @classmethod
+    def get_snapshot(cls) -> dict:
+        year = timezone.now().year
+        return get_or_compute(
+            cache_key("pension_snapshot", cls.version(), year),
+            lambda: cls._compute_logged(year),
+            cls.SNAPSHOT_TIMEOUT,
+        )
+
+    @classmethod
+    def _compute_logged(cls, year: int) -> dict:
+        snapshot = cls.compute(year)
+        logger.info(f"Computed pension snapshot for {year}: {snapshot['total_pension']}")
+        return snapshot
+
+    @classmethod
+    def total_pension(cls):
+        return cls.get_snapshot()["total_pension"]
@@ -0,0 +1,156 @@
+import logging
+import tempfile
+from decimal import Decimal
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from django.db.models import Sum
+from django.db.models.functions import ExtractYear
+
+from config import data_versions
+from config.cache import cache_key, cached_payload
+from stamps.services.ledger_service import LedgerService
+
+logger = logging.getLogger(__name__)
+
+
+class PivotService:
+    """
+    Matrix of total d1 per company/sector (rows) and invoice year (columns)
+    with row, column and grand totals.
+
+    Built from one grouped query over ``values()`` rows, never model
+    instances: the yearly rollups when the ledger is unfiltered, otherwise
+    the (entity, invoice_date) index of the ledger. Records without an
+    invoice date have no year and are left out, like in the yearly chart.
+    """
+
+    ENTITY_LABELS = {"company": "الشركة", "sector": "القطاع"}
+    TOTAL_LABEL = "الإجمالي"
+    CACHE_TIMEOUT = 60 * 60
+    XLSX_SPOOL_SIZE = 10 * 1024 * 1024
+
+    def __init__(self, service):
+        self.service = service
+        self.model = service.ledger_model
+        self.entity = self.model.LEDGER_ENTITY_FIELD
+
+    def grouped_rows(self, queryset):
+        """(entity id, entity name, year, total) dicts, one per non-empty cell."""
+        entity_field = LedgerService.entity_field(self.model)
+
+        if self.service.uses_rollup(queryset):
+            source = LedgerService.rollup_model(self.model).objects.filter(
+                **{f"{entity_field}__isnull": False}
+            )
+            total = Sum("total_d1")
+        else:
+            source = queryset.filter(invoice_date__isnull=False).annotate(
+                year=ExtractYear("invoice_date")
+            )
+            total = Sum("d1")
+
+        return (
+            source.values(entity_field, f"{self.entity}__name", "year")
+            .annotate(total=total)
+            .order_by()
+        )
+
+    def build(self, queryset) -> dict:
+        entity_field = LedgerService.entity_field(self.model)
+        cells = {}
+        names = {}
+        years = set()
+
+        for row in self.grouped_rows(queryset).iterator(chunk_size=2000):
+            entity_id, year = row[entity_field], int(row["year"])
+            names[entity_id] = row[f"{self.entity}__name"]
+            years.add(year)
+            cells[(entity_id, year)] = row["total"] or Decimal("0")
+
+        years = sorted(years)
+        column_totals = [Decimal("0")] * len(years)
+        rows = []
+        for entity_id, name in sorted(names.items(), key=lambda item: (item[1] or "", item[0])):
+            values = [cells.get((entity_id, year), Decimal("0")) for year in years]
+            for index, value in enumerate(values):
+                column_totals[index] += value
+            rows.append({"id": entity_id, "name": name, "values": values, "total": sum(values, Decimal("0"))})
+
+        logger.info(f"Built {self.entity} × year pivot: {len(rows)} rows × {len(years)} years")
+        return {
+            "entity": self.entity,
+            "years": years,
+            "rows": rows,
+            "column_totals": column_totals,
+            "grand_total": sum(column_totals, Decimal("0")),
+        }
+
+    def get_data(self, date_from=None, date_to=None) -> dict:
+        """Cached pivot of the ledger filtered like the list views (by invoice date)."""
+        key = cache_key(
+            "pivot",
+            self.model._meta.model_name,
+            date_from or "",
+            date_to or "",
+            data_versions.version_tag(data_versions.LEDGER),
+        )
+        return cached_payload(
+            key,
+            lambda: self.build(
+                self.service.filter_by_date_range(self.model.objects.all(), date_from, date_to)
+            ),
+            self.CACHE_TIMEOUT,
+        )
+
+    def export_xlsx(self, pivot: dict):
+        """
+        Write the pivot to a write-only (streaming) workbook and return the
+        file positioned at its start; it stays in memory up to
+        XLSX_SPOOL_SIZE and spills to disk beyond that.
+        """
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(f"{self.ENTITY_LABELS[self.entity]} × السنة")
+        ws.sheet_view.rightToLeft = True
+        ws.freeze_panes = "B2"
+        ws.column_dimensions["A"].width = 35
+        for index in range(len(pivot["years"]) + 1):
+            ws.column_dimensions[get_column_letter(index + 2)].width = 18
+
+        header_font = Font(name="Arial", size=12, bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        total_font = Font(name="Arial", size=12, bold=True)
+        total_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
+
+        def styled(values, font, fill):
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.font = font
+                cell.fill = fill
+                cells.append(cell)
+            return cells
+
+        ws.append(
+            styled(
+                [self.ENTITY_LABELS[self.entity], *map(str, pivot["years"]), self.TOTAL_LABEL],
+                header_font,
+                header_fill,
+            )
+        )
+        for row in pivot["rows"]:
+            ws.append([row["name"], *row["values"], row["total"]])
+        ws.append(
+            styled(
+                [self.TOTAL_LABEL, *pivot["column_totals"], pivot["grand_total"]],
+                total_font,
+                total_fill,
+            )
+        )
+
+        output = tempfile.SpooledTemporaryFile(max_size=self.XLSX_SPOOL_SIZE)
+        wb.save(output)
+        output.seek(0)
+        return output
@@ -0,0 +1,119 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from stamps.models import ExpectedStamp, StampCalculation
+
+logger = logging.getLogger(__name__)
+
+
+class RecalcScheduler:
+    """
+    Debounced, coalescing scheduler for full ledger recomputes.
+
+    Callers mark an entity dirty. One drain task per entity runs once the
+    entity has been quiet for ``QUIET_WINDOW_SECONDS``; if it is dirtied
+    again while the recompute runs, the drain runs again instead of the
+    request being dropped.
+    """
+
+    LEDGERS = {
+        "stamp": StampCalculation,
+        "expected": ExpectedStamp,
+    }
+
+    QUIET_WINDOW_SECONDS = 5
+    STATE_TIMEOUT = 60 * 60
+    RUNNING_TIMEOUT = 60 * 10
+
+    @classmethod
+    def ledger_key(cls, model) -> str:
+        return next(key for key, ledger in cls.LEDGERS.items() if ledger is model)
+
+    @staticmethod
+    def _key(ledger, entity_id, suffix) -> str:
+        return f"ledger_recalc:{ledger}:{entity_id}:{suffix}"
+
+    @classmethod
+    def generation(cls, ledger, entity_id) -> int:
+        return cache.get(cls._key(ledger, entity_id, "generation"), 0)
+
+    @classmethod
+    def mark_dirty(cls, model, entity_id):
+        """Record a change and make sure exactly one drain is scheduled."""
+        ledger = cls.ledger_key(model)
+
+        generation_key = cls._key(ledger, entity_id, "generation")
+        cache.add(generation_key, 0, cls.STATE_TIMEOUT)
+        cache.incr(generation_key)
+        cache.set(cls._key(ledger, entity_id, "last_dirty"), time.time(), cls.STATE_TIMEOUT)
+
+        if cache.add(cls._key(ledger, entity_id, "scheduled"), 1, cls.STATE_TIMEOUT):
+            cls.schedule_drain(ledger, entity_id, cls.QUIET_WINDOW_SECONDS)
+
+    @staticmethod
+    def _drain_task():
+        from stamps.tasks import drain_ledger_recalc_task
+
+        return drain_ledger_recalc_task
+
+    @classmethod
+    def supports_delay(cls) -> bool:
+        return cls._drain_task().get_backend().supports_defer
+
+    @classmethod
+    def schedule_drain(cls, ledger, entity_id, delay_seconds):
+        task = cls._drain_task()
+        if delay_seconds > 0 and cls.supports_delay():
+            task = task.using(run_after=timezone.now() + timedelta(seconds=delay_seconds))
+        task.enqueue(ledger, entity_id)
+
+    @classmethod
+    def drain(cls, ledger, entity_id, recalculate):
+        """
+        Body of the drain task. ``recalculate(model, entity_id)`` performs the
+        actual recompute and returns its summary (or None). Returns the
+        summaries of the passes that ran.
+        """
+        model = cls.LEDGERS[ledger]
+
+        last_dirty = cache.get(cls._key(ledger, entity_id, "last_dirty"), 0)
+        remaining = cls.QUIET_WINDOW_SECONDS - (time.time() - last_dirty)
+        if remaining > 0 and cls.supports_delay():
+            cls.schedule_drain(ledger, entity_id, remaining)
+            return []
+
+        running_key = cls._key(ledger, entity_id, "running")
+        owns_running = cache.add(running_key, 1, cls.RUNNING_TIMEOUT)
+        if not owns_running and cls.supports_delay():
+            # Another drain is mid-recompute; retry after it instead of dropping
+            cls.schedule_drain(ledger, entity_id, cls.QUIET_WINDOW_SECONDS)
+            return []
+
+        passes = []
+        scheduled_key = cls._key(ledger, entity_id, "scheduled")
+        try:
+            while True:
+                generation = cls.generation(ledger, entity_id)
+                passes.append(recalculate(model, entity_id))
+
+                cache.delete(scheduled_key)
+                if cls.generation(ledger, entity_id) == generation:
+                    break
+                if not cache.add(scheduled_key, 1, cls.STATE_TIMEOUT):
+                    # A fresh drain was already scheduled for the newer changes
+                    break
+                logger.info(f"{model.__name__} {entity_id} changed during recompute, re-running")
+        except Exception:
+            # Let the next mark_dirty() schedule a new drain; a leftover flag
+            # would swallow every request for this entity until it expires
+            cache.delete(scheduled_key)
+            raise
+        finally:
+            if owns_running:
+                cache.delete(running_key)
+
+        return passes
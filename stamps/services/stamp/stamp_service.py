@@ -1,15 +1,19 @@
 from django.utils.dateparse import parse_date
-from stamps.models import StampCalculation, Company
-from django.db.models import Sum, Q
+from stamps.models import StampCalculation, Company, CompanyStampBalance
+from django.db.models import Count, Sum, Q
 from typing import Optional
 from decimal import Decimal
 from stamps.services.main_stamp_service import BaseStampService
+from stamps.services.ledger_service import LedgerService
 from .stamp_pdf_service import StampPDFService
 from .stamp_excel_service import StampExcelService
 
 
 class StampService(BaseStampService):
 
+    ledger_model = StampCalculation
+    THIS_MONTH_BANNER_LIMIT = 20
+
     @staticmethod
     def get_queryset():
         return StampCalculation.objects.select_related("company")
@@ -46,14 +50,31 @@ class StampService(BaseStampService):
         )
 
     @staticmethod
-    def grouped_by_company(queryset):
-        return (
-            queryset.values(
-                "company__name", "company_id", "stamp_rate", "invoice_copies"
-            )
-            .annotate(total=Sum("d1"))
-            .order_by("-total")
+    def get_company_balance(company_id: int) -> Optional[CompanyStampBalance]:
+        return LedgerService.get_balance(StampCalculation, company_id)
+
+    @classmethod
+    def this_month_activity(cls, limit: int | None = None) -> dict:
+        """
+        Data for the "this month" banner: the latest ``limit`` stamps as plain
+        dicts plus the month's total and count, in two bounded queries.
+        """
+        limit = limit or cls.THIS_MONTH_BANNER_LIMIT
+        queryset = cls.get_this_month(StampCalculation.objects.all())
+
+        totals = queryset.aggregate(total=Sum("d1"), count=Count("id"))
+        recent = list(
+            queryset.order_by("-created_at", "-id").values("company__name", "d1")[:limit]
         )
+        return {
+            "recent": recent,
+            "total": totals["total"] or Decimal("0"),
+            "count": totals["count"],
+        }
+
+    @classmethod
+    def grouped_by_company(cls):
+        return cls.entity_summaries()
 
     @staticmethod
     def get_number_of_invoice_copies(queryset, company_id: int) -> int:
@@ -0,0 +1,175 @@
+import logging
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncYear
+from django.utils.dateparse import parse_date
+
+from config import data_versions
+from config.cache import cache_key, cached_payload
+from stamps.services.ledger_service import LedgerService
+
+logger = logging.getLogger(__name__)
+
+
+class TimeSeriesService:
+    """
+    Stamp revenue (sum of d1) and record count per month, quarter or year,
+    optionally for a date range and one company/sector, with empty periods
+    filled with zeros and the change from the previous period.
+
+    Filters are plain ranges on invoice_date, so they use the
+    (entity, invoice_date) / (invoice_date, id) indexes; the bucketing
+    (date_trunc) only runs over the rows in range. Results are cached per
+    (ledger, granularity, filters, data version of the ledger or the
+    entity). Amounts stay Decimal.
+    """
+
+    GRANULARITIES = {
+        "month": (TruncMonth, 1),
+        "quarter": (TruncQuarter, 3),
+        "year": (TruncYear, 12),
+    }
+    DEFAULT_GRANULARITY = "month"
+    MAX_PERIODS = 600
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    def __init__(self, service):
+        self.service = service
+        self.model = service.ledger_model
+
+    def clean(self, granularity=None, date_from=None, date_to=None, entity_id=None) -> dict:
+        """Validated filters; raises ValueError on bad input."""
+        granularity = granularity or self.DEFAULT_GRANULARITY
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(
+                f"granularity must be one of {', '.join(self.GRANULARITIES)}"
+            )
+
+        dates = {}
+        for name, value in (("date_from", date_from), ("date_to", date_to)):
+            try:
+                dates[name] = parse_date(value) if value else None
+            except ValueError:
+                dates[name] = None
+            if value and dates[name] is None:
+                raise ValueError(f"{name} must be a YYYY-MM-DD date")
+        if dates["date_from"] and dates["date_to"] and dates["date_from"] > dates["date_to"]:
+            raise ValueError("date_from must not be after date_to")
+
+        if entity_id in (None, "", "none", "None"):
+            entity_id = None
+        else:
+            try:
+                entity_id = int(entity_id)
+            except (TypeError, ValueError):
+                raise ValueError(f"{self.model.LEDGER_ENTITY_FIELD} must be an id")
+
+        return {"granularity": granularity, **dates, "entity_id": entity_id}
+
+    def version(self, entity_id=None) -> str:
+        if entity_id is None:
+            return data_versions.version_tag(data_versions.LEDGER)
+        return data_versions.version_tag(
+            data_versions.scope(self.model.LEDGER_ENTITY_FIELD, entity_id)
+        )
+
+    def get_data(self, **filters) -> dict:
+        filters = self.clean(**filters)
+        key = cache_key(
+            "time_series",
+            self.model._meta.model_name,
+            filters["granularity"],
+            filters["date_from"] or "",
+            filters["date_to"] or "",
+            filters["entity_id"] or "",
+            self.version(filters["entity_id"]),
+        )
+        return cached_payload(key, lambda: self.compute(**filters), self.CACHE_TIMEOUT)
+
+    def compute(self, granularity, date_from=None, date_to=None, entity_id=None) -> dict:
+        trunc, months = self.GRANULARITIES[granularity]
+
+        queryset = self.model.objects.filter(invoice_date__isnull=False)
+        if entity_id is not None:
+            queryset = queryset.filter(**{LedgerService.entity_field(self.model): entity_id})
+        if date_from:
+            queryset = queryset.filter(invoice_date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(invoice_date__lte=date_to)
+
+        buckets = {
+            row["period"]: row
+            for row in queryset.annotate(period=trunc("invoice_date"))
+            .order_by()
+            .values("period")
+            .annotate(total=Sum("d1"), count=Count("id"))
+        }
+
+        # Zero-fill between the requested bounds (or the data's own range)
+        first = self.bucket_start(date_from, months) if date_from else min(buckets, default=None)
+        last = self.bucket_start(date_to, months) if date_to else max(buckets, default=None)
+
+        points = []
+        if first is None or last is None or first > last:
+            first = last = None
+        elif self.month_index(last) - self.month_index(first) >= self.MAX_PERIODS * months:
+            raise ValueError(f"The range spans more than {self.MAX_PERIODS} periods")
+
+        previous = None
+        start = first
+        while start is not None and start <= last:
+            row = buckets.get(start, {})
+            total = row.get("total") or Decimal("0")
+            change = None if previous is None else total - previous
+            points.append(
+                {
+                    "period": self.label(start, granularity),
+                    "start": start,
+                    "total": total,
+                    "count": row.get("count", 0),
+                    "change": change,
+                    "change_pct": (
+                        round(float(change / previous * 100), 2) if previous else None
+                    ),
+                }
+            )
+            previous = total
+            start = self.add_months(start, months)
+
+        logger.info(
+            f"Computed {granularity} time series of {self.model.__name__} "
+            f"({len(points)} periods, entity {entity_id})"
+        )
+        return {
+            "granularity": granularity,
+            "date_from": date_from,
+            "date_to": date_to,
+            self.model.LEDGER_ENTITY_FIELD: entity_id,
+            "total": sum((point["total"] for point in points), Decimal("0")),
+            "points": points,
+        }
+
+    @staticmethod
+    def bucket_start(day: date, months: int) -> date:
+        """First day of the month/quarter/year containing ``day``."""
+        month = (day.month - 1) // months * months + 1
+        return date(day.year, month, 1)
+
+    @staticmethod
+    def month_index(day: date) -> int:
+        return day.year * 12 + day.month - 1
+
+    @classmethod
+    def add_months(cls, day: date, months: int) -> date:
+        index = cls.month_index(day) + months
+        return date(index // 12, index % 12 + 1, 1)
+
+    @staticmethod
+    def label(start: date, granularity: str) -> str:
+        if granularity == "year":
+            return f"{start.year}"
+        if granularity == "quarter":
+            return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+        return f"{start:%Y-%m}"
@@ -1,29 +1,82 @@
-from django.db.models.signals import post_delete, post_save
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from stamps.helpers import map_expected_stamp, map_stamp_calculation
+from stamps.helpers import erp_sync_suspended, map_expected_stamp, map_stamp_calculation
+from config import data_versions
 from stamps.models import ExpectedStamp, StampCalculation
-from stamps.tasks import  delete_stamp_from_erpnext_task, recalculate_expected_stamps_task, recalculate_stamp_calculations_task, sync_expected_stamp_to_erpnext_task, sync_stamp_to_erpnext_task
+from stamps.services.ledger_service import LedgerService
+from stamps.services.recalc_scheduler import RecalcScheduler
+from stamps.tasks import  delete_stamp_from_erpnext_task, enqueue_batched_erp_sync, sync_expected_stamp_to_erpnext_task, sync_stamp_to_erpnext_task
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# ERPNext tasks (and recompute scheduling) are queued on commit: the signals
+# run inside the save transaction, under the entity's balance row lock, and
+# a rolled-back write must not reach ERPNext.
+
+def _sync_shifted_records(model, shifted_ids):
+    """Re-sync records whose totals were shifted by a delta propagation"""
+    if shifted_ids and not erp_sync_suspended():
+        transaction.on_commit(partial(enqueue_batched_erp_sync, model, shifted_ids))
+
+
+def _bump_data_versions(instance, shifted_ids=()):
+    """
+    Bump (after commit) the data versions a ledger write changes: the
+    ledger, the record's company/sector and user before and after the
+    change, and the users owning the records whose totals were shifted
+    """
+    model = type(instance)
+    entity_field = LedgerService.entity_field(model)
+    entity_ids = {getattr(instance, entity_field)}
+    user_ids = {instance.user_id}
+
+    previous = getattr(instance, "_ledger_previous", None)
+    if previous is not None:
+        entity_ids.add(previous[entity_field])
+        user_ids.add(previous["user_id"])
+
+    if shifted_ids:
+        user_ids.update(
+            model.objects.filter(pk__in=shifted_ids)
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+
+    data_versions.bump_on_commit(*LedgerService.version_scopes(model, entity_ids, user_ids))
+
+
+@receiver(pre_delete, sender=StampCalculation)
+@receiver(pre_delete, sender=ExpectedStamp)
+def lock_ledger_before_delete(sender, instance, **kwargs):
+    """Lock the entity balance and the record inside the delete transaction"""
+    LedgerService.prepare_delete(instance)
+
+
 @receiver(post_delete, sender=StampCalculation)
 def handle_stamp_calculation_delete(sender, instance, **kwargs):
     """
     After deleting a StampCalculation:
     1. Delete from ERPNext
-    2. Recalculate totals for all remaining records of the same company
+    2. Shift the totals of the later records of the same company by -d1
+    3. Bump the data versions (pension snapshot, company and user caches)
     """
-    company_id = instance.company.id
-
-    logger.info(f"Deleting StampCalculation {instance.id} - queuing ERPNext deletion")
-    delete_stamp_from_erpnext_task.enqueue(instance.id, "Stamp Calculation")
+    if not erp_sync_suspended():
+        logger.info(f"Deleting StampCalculation {instance.id} - queuing ERPNext deletion")
+        transaction.on_commit(
+            partial(delete_stamp_from_erpnext_task.enqueue, instance.id, "Stamp Calculation")
+        )
 
+    shifted_ids = LedgerService.propagate_delete(instance)
+    _bump_data_versions(instance, shifted_ids)
     logger.info(
-        f"Queuing recalculation for company {company_id} after StampCalculation {instance.id} deletion"
+        f"Shifted {len(shifted_ids)} records of company {instance.company_id} after StampCalculation {instance.id} deletion"
     )
-    recalculate_stamp_calculations_task.enqueue(company_id)
+    _sync_shifted_records(StampCalculation, shifted_ids)
 
 
 @receiver(post_delete, sender=ExpectedStamp)
@@ -31,51 +84,86 @@ def handle_expected_stamp_delete(sender, instance, **kwargs):
     """
     After deleting an ExpectedStamp:
     1. Delete from ERPNext
-    2. Recalculate totals for all remaining records of the same sector
+    2. Shift the totals of the later records of the same sector by -d1
+    3. Bump the data versions (sector and user caches)
     """
-    sector_id = instance.sector.id
-
-    logger.info(f"Deleting ExpectedStamp {instance.id} - queuing ERPNext deletion")
-    delete_stamp_from_erpnext_task.enqueue(instance.id, "Expected Stamp")
+    if not erp_sync_suspended():
+        logger.info(f"Deleting ExpectedStamp {instance.id} - queuing ERPNext deletion")
+        transaction.on_commit(
+            partial(delete_stamp_from_erpnext_task.enqueue, instance.id, "Expected Stamp")
+        )
 
+    shifted_ids = LedgerService.propagate_delete(instance)
+    _bump_data_versions(instance, shifted_ids)
     logger.info(
-        f"Queuing recalculation for sector {sector_id} after ExpectedStamp {instance.id} deletion"
+        f"Shifted {len(shifted_ids)} records of sector {instance.sector_id} after ExpectedStamp {instance.id} deletion"
     )
-    recalculate_expected_stamps_task.enqueue(sector_id)
+    _sync_shifted_records(ExpectedStamp, shifted_ids)
 
 
 # Signal receivers - these run synchronously but queue background tasks
 @receiver(post_save, sender=StampCalculation)
-def sync_stamp_to_erpnext(sender, instance, created, **kwargs):
+def sync_stamp_to_erpnext(sender, instance, created, raw=False, **kwargs):
     """
     After saving a StampCalculation:
     1. Sync to ERPNext
-    2. If updated (not created), recalculate all records for the same company
+    2. Apply the record to the company balance and, if updated (not created),
+       shift the later records of the same company by the change in d1
+       (runs inside the save transaction)
+    3. Bump the data versions (pension snapshot, company and user caches)
     """
-    data = map_stamp_calculation(instance)
-    sync_stamp_to_erpnext_task.enqueue(instance.id, data)
+    if raw:
+        # Fixture loads bypass save(); the drained recompute rebuilds the
+        # company's running totals, balance row and yearly rollups
+        transaction.on_commit(
+            partial(RecalcScheduler.mark_dirty, StampCalculation, instance.company_id)
+        )
+        _bump_data_versions(instance)
+        return
+
+    if not erp_sync_suspended():
+        data = map_stamp_calculation(instance)
+        transaction.on_commit(partial(sync_stamp_to_erpnext_task.enqueue, instance.id, data))
 
-    # Recalculate all records if this was an update (not a new creation)
+    shifted_ids = LedgerService.propagate_save(instance, created)
+    _bump_data_versions(instance, shifted_ids)
     if not created:
         logger.info(
-            f"StampCalculation {instance.id} was updated - queuing recalculation for company {instance.company.id}"
+            f"StampCalculation {instance.id} was updated - shifted {len(shifted_ids)} later records"
         )
-        recalculate_stamp_calculations_task.enqueue(instance.company.id)
+        _sync_shifted_records(StampCalculation, shifted_ids)
 
 
 @receiver(post_save, sender=ExpectedStamp)
-def sync_expected_stamp_to_erpnext(sender, instance, created, **kwargs):
+def sync_expected_stamp_to_erpnext(sender, instance, created, raw=False, **kwargs):
     """
     After saving an ExpectedStamp:
     1. Sync to ERPNext
-    2. If updated (not created), recalculate all records for the same sector
+    2. Apply the record to the sector balance and, if updated (not created),
+       shift the later records of the same sector by the change in d1
+       (runs inside the save transaction)
+    3. Bump the data versions (sector and user caches)
     """
-    data = map_expected_stamp(instance)
-    sync_expected_stamp_to_erpnext_task.enqueue(instance.id, data)
+    if raw:
+        # Fixture loads bypass save(); the drained recompute rebuilds the
+        # sector's running totals, balance row and yearly rollups
+        transaction.on_commit(
+            partial(RecalcScheduler.mark_dirty, ExpectedStamp, instance.sector_id)
+        )
+        _bump_data_versions(instance)
+        return
 
-    # Recalculate all records if this was an update (not a new creation)
+    if not erp_sync_suspended():
+        data = map_expected_stamp(instance)
+        transaction.on_commit(
+            partial(sync_expected_stamp_to_erpnext_task.enqueue, instance.id, data)
+        )
+
+    shifted_ids = LedgerService.propagate_save(instance, created)
+    _bump_data_versions(instance, shifted_ids)
     if not created:
         logger.info(
-            f"ExpectedStamp {instance.id} was updated - queuing recalculation for sector {instance.sector.id}"
+            f"ExpectedStamp {instance.id} was updated - shifted {len(shifted_ids)} later records"
         )
-        recalculate_expected_stamps_task.enqueue(instance.sector.id)
+        _sync_shifted_records(ExpectedStamp, shifted_ids)
+
@@ -1,12 +1,13 @@
 from django.tasks import task
+from config.db_router import with_primary_write_scope
 from stamps.helpers import map_expected_stamp, map_stamp_calculation, sync_to_erpnext
 from stamps.services.erp_service import ERPNextClient
-from .models import Company, Sector, StampCalculation, ExpectedStamp
+from stamps.services.ledger_service import LedgerService
+from stamps.services.recalc_scheduler import RecalcScheduler
+from .models import StampCalculation, ExpectedStamp
 import logging
 from django.core.mail import send_mail
 from django.conf import settings
-from django.core.cache import cache
-from django.db import models
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,7 @@ logger = logging.getLogger(__name__)
 # ============================================================================
 
 @task()
+@with_primary_write_scope
 def sync_stamp_to_erpnext_task(instance_id, data):
     """Background task to sync stamp calculation to ERPNext"""
     try:
@@ -41,6 +43,7 @@ def sync_stamp_to_erpnext_task(instance_id, data):
 
 
 @task()
+@with_primary_write_scope
 def sync_expected_stamp_to_erpnext_task(instance_id, data):
     """Background task to sync expected stamp to ERPNext"""
     try:
@@ -65,11 +68,61 @@ def sync_expected_stamp_to_erpnext_task(instance_id, data):
         raise
 
 
+def _sync_batch_to_erpnext(model, doctype, mapper, instance_ids):
+    """Sync many records in one task, reporting all failures in one alert"""
+    related = [model.LEDGER_ENTITY_FIELD, "user__profile"]
+    synced = 0
+    failed = []
+
+    for start in range(0, len(instance_ids), 500):
+        chunk = instance_ids[start : start + 500]
+        for instance in model.objects.filter(id__in=chunk).select_related(*related):
+            try:
+                sync_to_erpnext(doctype, instance, mapper(instance))
+                synced += 1
+            except Exception as e:
+                logger.error(
+                    f"ERPNext sync failed for {model.__name__} {instance.id}: {str(e)}"
+                )
+                failed.append(instance.id)
+
+    logger.info(
+        f"Batch synced {synced} {model.__name__} records to ERPNext ({len(failed)} failed)"
+    )
+    if failed:
+        send_email.enqueue(
+            to_email=settings.DEFAULT_FROM_EMAIL,
+            first_name="Admin",
+            subject="ERPNext Sync Failure Alert",
+            message=f"Failed to sync {len(failed)} {model.__name__} records to ERPNext. IDs: {failed[:100]}",
+        )
+    return {"synced": synced, "failed": failed}
+
+
+@task()
+@with_primary_write_scope
+def sync_stamps_batch_to_erpnext_task(instance_ids):
+    """Background task to sync many stamp calculations to ERPNext"""
+    return _sync_batch_to_erpnext(
+        StampCalculation, "Stamp Calculation", map_stamp_calculation, instance_ids
+    )
+
+
+@task()
+@with_primary_write_scope
+def sync_expected_stamps_batch_to_erpnext_task(instance_ids):
+    """Background task to sync many expected stamps to ERPNext"""
+    return _sync_batch_to_erpnext(
+        ExpectedStamp, "Expected Stamp", map_expected_stamp, instance_ids
+    )
+
+
 # ============================================================================
 # DELETE TASKS
 # ============================================================================
 
 @task()
+@with_primary_write_scope
 def delete_stamp_from_erpnext_task(django_id, doctype):
     """Background task to delete stamp from ERPNext"""
     client = ERPNextClient()
@@ -94,6 +147,7 @@ def delete_stamp_from_erpnext_task(django_id, doctype):
 # ============================================================================
 
 @task()
+@with_primary_write_scope
 def send_email(to_email, first_name, subject, message):
     send_mail(
         subject,
@@ -108,116 +162,71 @@ def send_email(to_email, first_name, subject, message):
 # RECALCULATION TASKS
 # ============================================================================
 
-@task()
-def recalculate_stamp_calculations_task(company_id):
-    """Optimized version using bulk_update"""
-    lock_key = f"recalc_stamp_company_{company_id}"
+ERP_SYNC_BATCH_SIZE = 200
+
+
+def enqueue_batched_erp_sync(model, instance_ids) -> int:
+    """Queue batched ERPNext syncs for ``instance_ids``; returns the number of tasks"""
+    sync_task = (
+        sync_stamps_batch_to_erpnext_task
+        if model is StampCalculation
+        else sync_expected_stamps_batch_to_erpnext_task
+    )
+    instance_ids = list(instance_ids)
+    for start in range(0, len(instance_ids), ERP_SYNC_BATCH_SIZE):
+        sync_task.enqueue(instance_ids[start : start + ERP_SYNC_BATCH_SIZE])
+    return -(-len(instance_ids) // ERP_SYNC_BATCH_SIZE)
+
 
-    if not cache.add(lock_key, "locked", timeout=300):
-        logger.info(f"Skipping duplicate recalculation for company {company_id}")
+def recalculate_ledger(model, entity_id):
+    """Rebuild the running totals of one company/sector and re-sync changed rows"""
+    entity_model = model._meta.get_field(model.LEDGER_ENTITY_FIELD).related_model
+    if not entity_model.objects.filter(id=entity_id).exists():
+        logger.warning(f"{entity_model.__name__} {entity_id} no longer exists")
         return None
 
-    try:
-        company = Company.objects.get(id=company_id)
-        remaining_records = StampCalculation.objects.filter(company=company).order_by(
-            "created_at"
-        )
+    result = LedgerService.recompute(model, entity_id)
+    sync_calls = enqueue_batched_erp_sync(model, result["changed_ids"])
+
+    logger.info(
+        f"Bulk updated {result['updated']} {model.__name__} records for "
+        f"{model.LEDGER_ENTITY_FIELD} {entity_id}; queued {sync_calls} ERPNext sync calls"
+    )
+    return {
+        "entity_id": entity_id,
+        "updated_records": result["updated"],
+        "erp_sync_calls": sync_calls,
+    }
 
-        records_to_update = []
-
-        for record in remaining_records:
-            past_total = (
-                StampCalculation.objects.filter(
-                    company=record.company, created_at__lt=record.created_at
-                ).aggregate(models.Sum("d1"))["d1__sum"]
-                or 0
-            )
-
-            if (
-                record.total_past_years != past_total
-                or record.total_stamp_for_company != (record.d1 + past_total)
-            ):
-                record.total_past_years = past_total
-                record.total_stamp_for_company = record.d1 + past_total
-                records_to_update.append(record)
-            
-            data = map_stamp_calculation(record)
-            sync_stamp_to_erpnext_task.enqueue(record.id, data)
-
-        # Bulk update all records at once
-        if records_to_update:
-            StampCalculation.objects.bulk_update(
-                records_to_update, ["total_past_years", "total_stamp_for_company"]
-            )
-
-        logger.info(
-            f"Bulk updated {len(records_to_update)} StampCalculation records for company {company.name}"
-        )
-        return {"company_id": company_id, "updated_records": len(records_to_update)}
 
+@task()
+@with_primary_write_scope
+def drain_ledger_recalc_task(ledger, entity_id):
+    """Run the coalesced recompute of a dirty company/sector"""
+    try:
+        passes = RecalcScheduler.drain(ledger, entity_id, recalculate_ledger)
+        return {
+            "ledger": ledger,
+            "entity_id": entity_id,
+            "passes": passes,
+            "erp_sync_calls": sum(p["erp_sync_calls"] for p in passes if p),
+        }
     except Exception as e:
         logger.error(
-            f"Recalculation failed for company {company_id}: {str(e)}", exc_info=True
+            f"Recalculation failed for {ledger} {entity_id}: {str(e)}", exc_info=True
         )
         raise
-    finally:
-        cache.delete(lock_key)
 
 
 @task()
-def recalculate_expected_stamps_task(sector_id):
-    """Optimized version using bulk_update for ExpectedStamp"""
-    lock_key = f"recalc_expected_sector_{sector_id}"
-
-    if not cache.add(lock_key, "locked", timeout=300):
-        logger.info(f"Skipping duplicate recalculation for sector {sector_id}")
-        return None
-
-    try:
-        sector = Sector.objects.get(id=sector_id)
-        remaining_records = ExpectedStamp.objects.filter(sector=sector).order_by(
-            "created_at"
-        )
+@with_primary_write_scope
+def recalculate_stamp_calculations_task(company_id):
+    """Repair entry point: schedule a coalesced rebuild of a company's totals"""
+    RecalcScheduler.mark_dirty(StampCalculation, company_id)
 
-        records_to_update = []
-
-        for record in remaining_records:
-            past_total = (
-                ExpectedStamp.objects.filter(
-                    sector=record.sector, created_at__lt=record.created_at
-                ).aggregate(models.Sum("d1"))["d1__sum"]
-                or 0
-            )
-
-            if (
-                record.total_past_years != past_total
-                or record.total_stamp_for_company != (record.d1 + past_total)
-            ):
-                record.total_past_years = past_total
-                record.total_stamp_for_company = record.d1 + past_total
-                records_to_update.append(record)
-            
-            data = map_expected_stamp(record)
-            sync_expected_stamp_to_erpnext_task.enqueue(record.id, data)
-
-        # Bulk update all records at once
-        if records_to_update:
-            ExpectedStamp.objects.bulk_update(
-                records_to_update, ["total_past_years", "total_stamp_for_company"]
-            )
-
-        logger.info(
-            f"Bulk updated {len(records_to_update)} ExpectedStamp records for sector {sector.name}"
-        )
-        return {"sector_id": sector_id, "updated_records": len(records_to_update)}
 
-    except Sector.DoesNotExist:
-        logger.warning(f"Sector {sector_id} no longer exists")
-        return None
-    except Exception as e:
-        logger.error(
-            f"Recalculation failed for sector {sector_id}: {str(e)}", exc_info=True
-        )
-        raise
-    finally:
-        cache.delete(lock_key)
+@task()
+@with_primary_write_scope
+def recalculate_expected_stamps_task(sector_id):
+    """Repair entry point: schedule a coalesced rebuild of a sector's totals"""
+    RecalcScheduler.mark_dirty(ExpectedStamp, sector_id)
@@ -1,3 +1,454 @@
-from django.test import TestCase
+import json
+import random
+import threading
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from stamps.helpers import suspend_erp_sync
+from stamps.models import (
+    Company,
+    CompanyStampBalance,
+    ExpectedStamp,
+    Sector,
+    StampCalculation,
+)
+from stamps.services.expected_stamp.expected_stamp_service import ExpectedStampService
+from stamps.services.keyset_pagination import KeysetPaginator
+from stamps.services.ledger_service import LedgerService
+from stamps.services.recalc_scheduler import RecalcScheduler
+from stamps.services.stamp.stamp_service import StampService
+
+
+class LedgerTestMixin:
+    """Records and consistency checks shared by the ledger tests"""
+
+    # The signals queue no ERPNext tasks unless a test mocks them and opts in
+    erp_sync = False
+
+    def setUp(self):
+        if not self.erp_sync:
+            self.enterContext(suspend_erp_sync())
+        self.user = User.objects.create_user(username="ledger-test")
+
+    def add_stamp(self, company, value_of_work, invoice_date=None, copies=1):
+        return StampCalculation.objects.create(
+            user=self.user,
+            company=company,
+            value_of_work=Decimal(value_of_work),
+            invoice_copies=copies,
+            invoice_date=invoice_date,
+            stamp_rate=Decimal("0.0015"),
+            exchange_rate=Decimal("1"),
+        )
+
+    def add_expected_stamp(self, sector, value_of_work, invoice_date=None, copies=1):
+        return ExpectedStamp.objects.create(
+            user=self.user,
+            sector=sector,
+            value_of_work=Decimal(value_of_work),
+            invoice_copies=copies,
+            invoice_date=invoice_date,
+            stamp_rate=Decimal("0.0015"),
+            exchange_rate=Decimal("1"),
+        )
+
+    def assertLedgerConsistent(self, model, *entity_ids):
+        entity_field = LedgerService.entity_field(model)
+        for entity_id in entity_ids:
+            running = Decimal("0")
+            for record in model.objects.filter(**{entity_field: entity_id}).order_by(
+                "created_at", "id"
+            ):
+                self.assertEqual(record.total_past_years, running)
+                running += record.d1 or 0
+                self.assertEqual(record.total_stamp_for_company, running)
+
+            drift = LedgerService.recompute(model, entity_id, dry_run=True)
+            self.assertEqual(drift["changed_ids"], [])
+            self.assertFalse(drift["balance_drift"])
+            self.assertEqual(drift["rollup_drift"], [])
+
+        self.assertEqual(LedgerService.rebuild_balances(model, dry_run=True), [])
+        self.assertEqual(LedgerService.rebuild_rollups(model, dry_run=True), [])
+
+
+class LedgerServiceTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.company = Company.objects.create(name="Company A")
+        self.other_company = Company.objects.create(name="Company B")
+        self.records = [
+            self.add_stamp(self.company, 1_000_000 * (i + 1), date(2020 + i % 3, 1, 1))
+            for i in range(5)
+        ]
+        self.add_stamp(self.other_company, 4_000_000, date(2021, 6, 1))
+
+    def test_insert(self):
+        self.add_stamp(self.company, 2_000_000, date(2024, 3, 1), copies=2)
+        self.add_stamp(self.company, 500_000)
+
+        balance = CompanyStampBalance.objects.get(company=self.company)
+        self.assertEqual(balance.record_count, 7)
+        self.assertEqual(balance.total_invoice_copies, 8)
+        self.assertLedgerConsistent(StampCalculation, self.company.id, self.other_company.id)
+
+    def test_update_in_the_middle(self):
+        record = StampCalculation.objects.get(pk=self.records[2].pk)
+        record.value_of_work = Decimal(10_000_000)
+        record.invoice_date = date(2019, 12, 31)
+        record.save()
+
+        self.assertLedgerConsistent(StampCalculation, self.company.id, self.other_company.id)
+
+    def test_move_to_another_company(self):
+        record = StampCalculation.objects.get(pk=self.records[1].pk)
+        record.company = self.other_company
+        record.save()
+
+        self.assertEqual(
+            CompanyStampBalance.objects.get(company=self.other_company).record_count, 2
+        )
+        self.assertLedgerConsistent(StampCalculation, self.company.id, self.other_company.id)
+
+    def test_delete_in_the_middle(self):
+        StampCalculation.objects.get(pk=self.records[2].pk).delete()
+
+        self.assertEqual(CompanyStampBalance.objects.get(company=self.company).record_count, 4)
+        self.assertLedgerConsistent(StampCalculation, self.company.id, self.other_company.id)
+
+    def test_recompute_repairs_drift(self):
+        # Writes that bypass the signals (queryset.update, fixtures)
+        StampCalculation.objects.filter(pk=self.records[1].pk).update(d1=Decimal(123))
+        CompanyStampBalance.objects.filter(company=self.company).update(record_count=0)
+
+        drift = LedgerService.recompute(StampCalculation, self.company.id, dry_run=True)
+        self.assertEqual(drift["changed_ids"], [record.pk for record in self.records[1:]])
+        self.assertTrue(drift["balance_drift"])
+
+        LedgerService.recompute(StampCalculation, self.company.id)
+        self.assertLedgerConsistent(StampCalculation, self.company.id, self.other_company.id)
+
+    def test_expected_stamps(self):
+        sector = Sector.objects.create(name="Sector A")
+        records = [
+            self.add_expected_stamp(sector, 3_000_000, date(2022, 1, 1)) for _ in range(3)
+        ]
+
+        record = ExpectedStamp.objects.get(pk=records[1].pk)
+        record.invoice_copies = 4
+        record.save()
+        records[0].delete()
+
+        self.assertLedgerConsistent(ExpectedStamp, sector.id)
+
+
+@skipUnless(connection.vendor == "postgresql", "Row locks are only enforced on PostgreSQL")
+class ConcurrentLedgerWriteTests(LedgerTestMixin, TransactionTestCase):
+    """
+    Append, edit, move and delete records of two companies from several
+    threads at once, through the normal signals with the ERPNext tasks mocked, then
+    check every running total and balance row against a full recompute.
+    """
+
+    erp_sync = True
+    THREADS = 6
+    WRITES_PER_THREAD = 15
+
+    def setUp(self):
+        self.erp_tasks = [
+            self.enterContext(mock.patch(f"stamps.signals.{name}"))
+            for name in (
+                "sync_stamp_to_erpnext_task",
+                "delete_stamp_from_erpnext_task",
+                "enqueue_batched_erp_sync",
+            )
+        ]
+        super().setUp()
+        self.companies = [
+            Company.objects.create(name="Company A"),
+            Company.objects.create(name="Company B"),
+        ]
+        self.seeded_ids = [
+            self.add_stamp(self.companies[i % 2], 1_000_000 * (i + 1), date(2020 + i % 4, 1, 1)).pk
+            for i in range(12)
+        ]
+
+    def write(self, rng, own_ids):
+        """One random append, edit, move or delete of a record."""
+        roll = rng.random()
+        if roll < 0.45:
+            record = self.add_stamp(
+                rng.choice(self.companies),
+                rng.randint(10_000, 10_000_000),
+                date(rng.randint(2019, 2024), 1, 1),
+                copies=rng.randint(1, 5),
+            )
+            own_ids.append(record.pk)
+        elif roll < 0.55 and own_ids:
+            # Only this thread's records, so no edit races a deleted row
+            StampCalculation.objects.get(pk=own_ids.pop(rng.randrange(len(own_ids)))).delete()
+        else:
+            record = StampCalculation.objects.get(pk=rng.choice(self.seeded_ids))
+            record.value_of_work = Decimal(rng.randint(10_000, 10_000_000))
+            record.invoice_copies = rng.randint(1, 5)
+            if rng.random() < 0.25:
+                record.company = rng.choice(self.companies)
+            record.save()
+
+    def test_concurrent_writes(self):
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            own_ids = []
+            try:
+                start.wait()
+                for _ in range(self.WRITES_PER_THREAD):
+                    self.write(rng, own_ids)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertGreater(StampCalculation.objects.count(), len(self.seeded_ids))
+        sync_task, delete_task, _ = self.erp_tasks
+        self.assertTrue(sync_task.enqueue.called)
+        self.assertTrue(delete_task.enqueue.called)
+
+        company_ids = [company.id for company in self.companies]
+        self.assertLedgerConsistent(StampCalculation, *company_ids)
+        for company_id in company_ids:
+            records = StampCalculation.objects.filter(company_id=company_id)
+            balance = LedgerService.get_balance(StampCalculation, company_id)
+            self.assertEqual(balance.record_count, records.count())
+            self.assertEqual(
+                balance.total_d1, sum((record.d1 for record in records), Decimal("0"))
+            )
+
+
+class KeysetPaginatorTests(LedgerTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        company = Company.objects.create(name="Company A")
+        # Repeated dates and NULLs, so pages split inside ties and the NULL block
+        invoice_dates = [
+            date(2021, 1, 1), None, date(2020, 5, 1), date(2021, 1, 1), None,
+            date(2019, 3, 1), date(2021, 1, 1), None, date(2020, 5, 1),
+        ]
+        self.records = [self.add_stamp(company, 1_000_000, day) for day in invoice_dates]
+
+    def expected_ids(self, descending):
+        # NULL invoice dates sort above every date, ties broken by id
+        def key(record):
+            return (record.invoice_date is None, record.invoice_date or date.min, record.pk)
+
+        return [record.pk for record in sorted(self.records, key=key, reverse=descending)]
+
+    def walk(self, paginator):
+        """Ids page by page, following next cursors and then back via previous cursors."""
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_page_number()))
+
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous():
+            backwards.append(paginator.page(backwards[-1].previous_page_number()))
+
+        return (
+            [[record.pk for record in page] for page in pages],
+            [[record.pk for record in page] for page in reversed(backwards)],
+            [page.number for page in pages],
+        )
+
+    def test_seek_through_nulls_and_ties(self):
+        for sort, descending in (("-invoice_date", True), ("invoice_date", False)):
+            with self.subTest(sort=sort):
+                paginator = KeysetPaginator(StampCalculation.objects.order_by(sort), 2)
+                forward, backward, numbers = self.walk(paginator)
+
+                expected = self.expected_ids(descending)
+                self.assertEqual(sum(forward, []), expected)
+                self.assertTrue(all(len(page) == 2 for page in forward[:-1]))
+                self.assertEqual(backward, forward)
+                self.assertEqual(numbers, list(range(1, len(forward) + 1)))
+
+    def test_created_at_sort(self):
+        paginator = KeysetPaginator(StampCalculation.objects.order_by("-created_at"), 4)
+        forward, backward, _ = self.walk(paginator)
+
+        self.assertEqual(sum(forward, []), [record.pk for record in reversed(self.records)])
+        self.assertEqual(backward, forward)
+
+    def test_bad_or_foreign_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(StampCalculation.objects.order_by("-invoice_date"), 2)
+        first = [record.pk for record in paginator.page()]
+        token = paginator.page().next_page_number()
+
+        other = KeysetPaginator(StampCalculation.objects.order_by("invoice_date"), 2)
+        for bad in ("not-a-cursor", "1", token[:-3]):
+            with self.subTest(token=bad):
+                self.assertEqual([record.pk for record in paginator.page(bad)], first)
+        # A cursor issued under another sort order restarts that order
+        self.assertEqual(other.page(token).number, 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "Query plans are only checked on PostgreSQL")
+class QueryPlanTests(LedgerTestMixin, TestCase):
+    """
+    EXPLAIN the hot stamp queries (BaseStampService filters, ledger
+    recompute, keyset pages) with sequential scans disabled, so the plans do
+    not depend on the size of the test data. Every scan of a ledger table
+    must then be driven by an index condition; the unfiltered keyset page
+    must instead read an index in order, without sorting the table.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.company = Company.objects.create(name="Company A")
+        self.sector = Sector.objects.create(name="Sector A")
+        for year in (2020, 2021, 2022):
+            self.add_stamp(self.company, 1_000_000, date(year, 1, 1))
+            self.add_expected_stamp(self.sector, 1_000_000, date(year, 1, 1))
+        self.add_stamp(self.company, 1_000_000)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def queries(self, service, entity_id):
+        """(name, queryset) pairs in the shapes the services and views issue."""
+        model = service.ledger_model
+        entity_field = LedgerService.entity_field(model)
+        base = service.get_queryset()
+
+        entity_qs = base.filter(**{entity_field: entity_id})
+        entity_keyset = KeysetPaginator(service.sort(entity_qs, "-created_at"), 10)
+
+        return [
+            ("entity list, newest first", service.sort(entity_qs, "-created_at")[:10]),
+            ("entity list, by invoice date", service.sort(entity_qs, "-invoice_date")[:10]),
+            (
+                "my stamps (user filter)",
+                service.sort(service.filter_by_user(base, self.user.id), "-created_at")[:10],
+            ),
+            (
+                "date range",
+                service.sort(
+                    service.filter_by_date_range(base, "2021-01-01", "2021-12-31"),
+                    "-invoice_date",
+                )[:10],
+            ),
+            (
+                "entity keyset page",
+                entity_keyset.queryset.order_by(*entity_keyset.ordering())[:11],
+            ),
+            ("year total", base.filter(invoice_date__year=2021).order_by().values("id")),
+            ("entity running totals", LedgerService.running_totals(model, entity_id)),
+        ]
+
+    def plan_nodes(self, queryset):
+        nodes = []
+
+        def walk(node):
+            nodes.append(node)
+            for child in node.get("Plans", []):
+                walk(child)
+
+        walk(json.loads(queryset.explain(format="json"))[0]["Plan"])
+        return nodes
+
+    def ledger_scans(self, nodes, table):
+        """(node type, index name, index condition) of the scans of ``table``."""
+        scans = []
+        for node in nodes:
+            if node.get("Node Type") == "Bitmap Heap Scan" and node.get("Relation Name") == table:
+                # The condition sits on the Bitmap Index Scan below it
+                for child in node.get("Plans", []):
+                    scans.append(
+                        (child["Node Type"], child.get("Index Name"), child.get("Index Cond"))
+                    )
+            elif node.get("Relation Name") == table:
+                scans.append((node["Node Type"], node.get("Index Name"), node.get("Index Cond")))
+        return scans
+
+    def test_filtered_queries_use_index_conditions(self):
+        ledgers = [
+            (StampService(), self.company.id),
+            (ExpectedStampService(), self.sector.id),
+        ]
+        for service, entity_id in ledgers:
+            table = service.ledger_model._meta.db_table
+            for name, queryset in self.queries(service, entity_id):
+                with self.subTest(ledger=service.ledger_model.__name__, query=name):
+                    scans = self.ledger_scans(self.plan_nodes(queryset), table)
+                    self.assertTrue(scans)
+                    for node_type, index, condition in scans:
+                        self.assertNotEqual(node_type, "Seq Scan")
+                        self.assertIsNotNone(condition, f"{node_type} on {index} without a condition")
+
+    def test_unfiltered_keyset_page_reads_the_index_in_order(self):
+        for service in (StampService(), ExpectedStampService()):
+            table = service.ledger_model._meta.db_table
+            for sort in ("-invoice_date", "invoice_date", "-created_at", "created_at"):
+                with self.subTest(ledger=service.ledger_model.__name__, sort=sort):
+                    keyset = KeysetPaginator(service.sort(service.get_queryset(), sort), 10)
+                    nodes = self.plan_nodes(keyset.queryset.order_by(*keyset.ordering())[:11])
+
+                    self.assertNotIn("Sort", [node["Node Type"] for node in nodes])
+                    scans = self.ledger_scans(nodes, table)
+                    self.assertEqual(len(scans), 1)
+                    self.assertIn(scans[0][0], ("Index Scan", "Index Only Scan"))
+                    self.assertNotEqual(scans[0][1], f"{table}_pkey")
+
+
+class RecalcSchedulerTests(TestCase):
+    ENTITY_ID = 424242
+
+    def setUp(self):
+        cache.delete_many(
+            [
+                RecalcScheduler._key("stamp", self.ENTITY_ID, suffix)
+                for suffix in ("generation", "last_dirty", "scheduled", "running")
+            ]
+        )
+        # Drains run inline here instead of being queued as tasks
+        self.schedule = self.enterContext(mock.patch.object(RecalcScheduler, "schedule_drain"))
+        self.enterContext(mock.patch.object(RecalcScheduler, "supports_delay", return_value=False))
+
+    def test_marks_coalesce_until_drained(self):
+        RecalcScheduler.mark_dirty(StampCalculation, self.ENTITY_ID)
+        RecalcScheduler.mark_dirty(StampCalculation, self.ENTITY_ID)
+        self.assertEqual(self.schedule.call_count, 1)
+
+        passes = RecalcScheduler.drain("stamp", self.ENTITY_ID, lambda model, entity_id: entity_id)
+        self.assertEqual(passes, [self.ENTITY_ID])
+
+        RecalcScheduler.mark_dirty(StampCalculation, self.ENTITY_ID)
+        self.assertEqual(self.schedule.call_count, 2)
+
+    def test_failed_drain_does_not_swallow_later_marks(self):
+        RecalcScheduler.mark_dirty(StampCalculation, self.ENTITY_ID)
+        self.assertEqual(self.schedule.call_count, 1)
+
+        def fail(model, entity_id):
+            raise RuntimeError("database went away")
+
+        with self.assertRaises(RuntimeError):
+            RecalcScheduler.drain("stamp", self.ENTITY_ID, fail)
+
+        RecalcScheduler.mark_dirty(StampCalculation, self.ENTITY_ID)
+        self.assertEqual(self.schedule.call_count, 2)
+        self.schedule.assert_called_with("stamp", self.ENTITY_ID, RecalcScheduler.QUIET_WINDOW_SECONDS)
@@ -6,8 +6,11 @@ from stamps.views.stamp import (
     GroupedStampListView,
     StampDetailView,
     StampDashboardView,
+    StampDashboardDataView,
+    StampTimeSeriesView,
+    StampPivotView,
 )
-from stamps.views.expected_stamp import ExpectedStampListView, ExpectedStampCreateView, GroupedExpectedStampListView,ExpectedStampDetailView,ExpectedStampDashboardView
+from stamps.views.expected_stamp import ExpectedStampListView, ExpectedStampCreateView, GroupedExpectedStampListView,ExpectedStampDetailView,ExpectedStampDashboardView,ExpectedStampDashboardDataView,ExpectedStampTimeSeriesView,ExpectedStampPivotView
 
 urlpatterns = [
     path("", StampListView.as_view(), name="stamp_list"),
@@ -33,9 +36,31 @@ urlpatterns = [
         name="expected_stamp_detail",
     ),
     path("stamp_dashboard/", StampDashboardView.as_view(), name="stamp_dashboard"),
+    path(
+        "stamp_dashboard/data/",
+        StampDashboardDataView.as_view(),
+        name="stamp_dashboard_data",
+    ),
     path(
         "expected_stamp_dashboard/",
         ExpectedStampDashboardView.as_view(),
         name="expected_stamp_dashboard",
     ),
+    path(
+        "expected_stamp_dashboard/data/",
+        ExpectedStampDashboardDataView.as_view(),
+        name="expected_stamp_dashboard_data",
+    ),
+    path("time_series/", StampTimeSeriesView.as_view(), name="stamp_time_series"),
+    path(
+        "expected_stamps/time_series/",
+        ExpectedStampTimeSeriesView.as_view(),
+        name="expected_stamp_time_series",
+    ),
+    path("pivot/", StampPivotView.as_view(), name="stamp_pivot"),
+    path(
+        "expected_stamps/pivot/",
+        ExpectedStampPivotView.as_view(),
+        name="expected_stamp_pivot",
+    ),
 ]
@@ -1,15 +1,27 @@
 from django.http import HttpResponse
+from django.views import View
 from django.views.generic import ListView, CreateView, DetailView, TemplateView
 from django.contrib.messages.views import SuccessMessageMixin
 from django.urls import reverse_lazy
+from config.db_router import use_replica
+from config.paginator import ApproximateCountPaginator
+from stamps.services.dashboard_service import DashboardService
 from stamps.services.expected_stamp.expected_stamp_service import ExpectedStampService
 from ..models import  Sector
 from ..forms import ExpectedStampForm
+from .mixins import (
+    DashboardDataMixin,
+    KeysetPaginationMixin,
+    PivotMixin,
+    ReplicaReadMixin,
+    StampSummaryMixin,
+    TimeSeriesMixin,
+)
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import render
 
 
-class ExpectedStampListView(ListView):
+class ExpectedStampListView(StampSummaryMixin, KeysetPaginationMixin, ListView):
     template_name = "expected_stamps/expected_stamp_list.html"
     context_object_name = "expected_stamps"
     paginate_by = 10
@@ -39,6 +51,7 @@ class ExpectedStampListView(ListView):
         context = self.get_context_data()
         return self.render_to_response(context)
 
+    @use_replica
     def handle_export(self, request, queryset):
         file_type = request.GET.get("download")
         sector_id = self.request.GET.get("sector")
@@ -73,11 +86,13 @@ class ExpectedStampListView(ListView):
             )
             return response
 
+    def get_summary_year(self):
+        return self.service.get_last_year((self.request.GET.get("date_to"),))
+
     def get_context_data(self, **kwargs):
         date_to = (self.request.GET.get("date_to"),)
-        year = self.service.get_last_year(date_to)
         context = super().get_context_data(**kwargs)
-        qs = self.object_list
+        summary = self.summary
 
         context.update(
             {
@@ -86,37 +101,33 @@ class ExpectedStampListView(ListView):
                 "date_from": self.request.GET.get("date_from", ""),
                 "date_to": date_to or "",
                 "sort_by": self.request.GET.get("sort", "-created_at"),
-                "total_all_sectors": self.service.total_amount(qs),
-                "total_pension": self.service.calculate_pension(qs, year),
-                "30_previous_year": self.service.get_30_from_previous_year(qs),
+                "total_all_sectors": summary["total"],
+                "total_pension": summary["pension"],
+                "30_previous_year": summary["30_previous_year"],
             }
         )
         return context
 
 
-class GroupedExpectedStampListView(ListView):
+class GroupedExpectedStampListView(ReplicaReadMixin, ListView):
     template_name = "expected_stamps/expected_stamp_list_grouped.html"
     context_object_name = "grouped_qs"
     paginate_by = 10
+    paginator_class = ApproximateCountPaginator
 
     @property
     def service(self):
         return ExpectedStampService()
 
     def get_queryset(self):
-        qs = self.service.get_queryset()
-        return self.service.grouped_by_sector(qs)
+        return self.service.grouped_by_sector()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        qs = self.object_list
 
-        context["total_all_sectors"] = self.service.total_amount(
-            qs  # full queryset, not paginated
-        )
-        context["total_sectors"] = self.service.total_sectors(
-            qs  # full queryset, not paginated
-        )
+        totals = self.service.entity_summary_totals()
+        context["total_all_sectors"] = totals["total"]
+        context["total_sectors"] = totals["entities"]
         return context
 
 class ExpectedStampDetailView(DetailView):
@@ -134,11 +145,10 @@ class ExpectedStampDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         stamp = self.object
-        sector_id = stamp.sector_id
-        qs = self.service.get_queryset()
-        context["total_amount_for_sector"] = self.service.total_amount_for_sector(qs,sector_id)
-        context["total_invoice_copies_for_sector"] = self.service.get_number_of_invoice_copies(
-            qs, sector_id
+        balance = self.service.get_sector_balance(stamp.sector_id)
+        context["total_amount_for_sector"] = balance.total_d1 if balance else 0
+        context["total_invoice_copies_for_sector"] = (
+            balance.total_invoice_copies if balance else 0
         )
         return context
 
@@ -154,36 +164,24 @@ class ExpectedStampCreateView(LoginRequiredMixin,SuccessMessageMixin, CreateView
 
 
 class ExpectedStampDashboardView(TemplateView):
-    template_name = "expected_stamps/expected_stamp_dashboard.html"
-
-    FILTER_MAP = {
-        "last_3_year": 3,
-        "last_5_years": 5,
-        "last_7_years": 7,
-        "last_10_years": 10,
-    }
+    """Page shell; the figures are loaded from ExpectedStampDashboardDataView."""
 
-    def dispatch(self, request, *args, **kwargs):
-        self.service = ExpectedStampService()
-        return super().dispatch(request, *args, **kwargs)
+    template_name = "expected_stamps/expected_stamp_dashboard.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context["current_filter"] = DashboardService.clean_filter(self.request.GET.get("filter"))
+        return context
 
-        time_filter = self.request.GET.get("filter", "all")
-        years = None if time_filter == "all" else self.FILTER_MAP.get(time_filter)
 
-        excepted_stamps =  self.service.filter_by_years(self.service.get_queryset(), years)
+class ExpectedStampDashboardDataView(DashboardDataMixin, View):
+    service_class = ExpectedStampService
 
-        chart = self.service.yearly_chart(excepted_stamps)
 
-        context = {
-            "total_excepted_stamps": self.service.total_amount(excepted_stamps),
-            "chart_categories": chart["categories"],
-            "excepted_stamp_data": chart["yearly"],
-            "total_past_excepted_stamps_data": chart["cumulative"],
-            "total_pension": self.service.calculate_pension(excepted_stamps),
-            "current_filter": time_filter,
-        }
+class ExpectedStampTimeSeriesView(TimeSeriesMixin, View):
+    service_class = ExpectedStampService
 
-        return context
+
+class ExpectedStampPivotView(PivotMixin, View):
+    service_class = ExpectedStampService
+    xlsx_filename = "expected_stamp_sector_year_pivot.xlsx"
@@ -0,0 +1,174 @@
+from django.http import FileResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+
+from config.db_router import read_from_replica
+from config.paginator import ApproximateCountPaginator
+from stamps.services.dashboard_service import DashboardService
+from stamps.services.keyset_pagination import KeysetPaginator
+from stamps.services.pivot_service import PivotService
+from stamps.services.time_series_service import TimeSeriesService
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin for cursor pagination: ``?page=`` carries a KeysetPaginator
+    token instead of a page number, so deep pages cost the same as the first.
+    Set ``pagination_mode = "offset"`` to fall back to page numbers with an
+    ApproximateCountPaginator.
+    """
+
+    pagination_mode = "keyset"
+    paginator_class = ApproximateCountPaginator
+
+    def get_pagination_count(self):
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.pagination_mode != "keyset":
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, count=self.get_pagination_count)
+        page = paginator.page(self.request.GET.get(self.page_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class StampSummaryMixin:
+    """
+    ListView mixin for stamp lists: runs ``service.summarize()`` once over the
+    filtered queryset and hands its row count to the paginator, so the page
+    needs no separate COUNT(*).
+    """
+
+    def get_summary_year(self):
+        return None
+
+    @cached_property
+    def summary(self) -> dict:
+        return self.service.summarize(self.object_list, self.get_summary_year())
+
+    def get_pagination_count(self):
+        return self.summary["count"]
+
+    def get_paginator(self, queryset, per_page, *args, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, *args, **kwargs)
+        paginator.count = self.summary["count"]
+        return paginator
+
+
+class ReplicaReadMixin:
+    """
+    Serve a read-only view from the read replica. The response is rendered
+    inside the block so lazy querysets in the template use it too.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_from_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+
+class CachedJSONMixin:
+    """
+    JSON endpoint for a cached_payload(): answers with its data plus
+    ETag/Last-Modified, so clients revalidate with a 304. Subclasses
+    implement ``get_payload(request)``, returning the cached_payload() for
+    the request's query parameters or raising ValueError for bad ones
+    (→ 400).
+
+    Not to be combined with ReplicaReadMixin: the payload is cached under
+    the data version the primary bumps on commit, so one computed on a
+    lagging replica would be served (and 304-confirmed) as current until
+    the next write.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            payload = self.get_payload(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        etag = quote_etag(payload["etag"])
+        last_modified = int(payload["last_modified"].timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        ) or JsonResponse(payload["data"])
+
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = http_date(last_modified)
+        # Cacheable, but always revalidated: a stamp write changes the ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class DashboardDataMixin(CachedJSONMixin):
+    """
+    JSON endpoint behind a stamp dashboard: the DashboardService payload for
+    ``?filter=`` (``?top=N`` adds a per-company/sector breakdown).
+    Subclasses set ``service_class``.
+    """
+
+    service_class = None
+
+    def get_payload(self, request):
+        return DashboardService(self.service_class()).get_data(
+            request.GET.get("filter"), request.GET.get("top")
+        )
+
+
+class TimeSeriesMixin(CachedJSONMixin):
+    """
+    JSON time series of a ledger: ``?granularity=month|quarter|year``,
+    ``?date_from=`` / ``?date_to=`` and ``?company=`` / ``?sector=`` like the
+    list filters. Subclasses set ``service_class``.
+    """
+
+    service_class = None
+
+    def get_payload(self, request):
+        service = self.service_class()
+        return TimeSeriesService(service).get_data(
+            granularity=request.GET.get("granularity"),
+            date_from=request.GET.get("date_from"),
+            date_to=request.GET.get("date_to"),
+            entity_id=request.GET.get(service.ledger_model.LEDGER_ENTITY_FIELD),
+        )
+
+
+class PivotMixin(CachedJSONMixin):
+    """
+    Company/sector × year pivot of a ledger as JSON, or as an XLSX download
+    with ``?format=xlsx``. ``?date_from=`` / ``?date_to=`` filter by invoice
+    date like the lists. Subclasses set ``service_class``.
+    """
+
+    service_class = None
+    xlsx_filename = "pivot.xlsx"
+
+    def get_pivot_service(self):
+        return PivotService(self.service_class())
+
+    def get_payload(self, request):
+        return self.get_pivot_service().get_data(
+            request.GET.get("date_from"), request.GET.get("date_to")
+        )
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("format") != "xlsx":
+            return super().get(request, *args, **kwargs)
+
+        try:
+            pivot = self.get_payload(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        return FileResponse(
+            self.get_pivot_service().export_xlsx(pivot["data"]),
+            as_attachment=True,
+            filename=self.xlsx_filename,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
@@ -1,16 +1,28 @@
+from django.views import View
 from django.views.generic import ListView, CreateView,DetailView,TemplateView
 from django.urls import reverse_lazy
 from django.contrib.messages.views import SuccessMessageMixin
 from django.http import HttpResponse
 
+from config.db_router import use_replica
+from config.paginator import ApproximateCountPaginator
+from stamps.services.dashboard_service import DashboardService
 from stamps.services.stamp.stamp_service import StampService
 from ..forms import StampCalculationForm
 from ..models import Company
+from .mixins import (
+    DashboardDataMixin,
+    KeysetPaginationMixin,
+    PivotMixin,
+    ReplicaReadMixin,
+    StampSummaryMixin,
+    TimeSeriesMixin,
+)
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import render
 
 
-class StampListView(ListView):
+class StampListView(StampSummaryMixin, KeysetPaginationMixin, ListView):
     template_name = "stamps/stamp_list.html"
     context_object_name = "stamps"
     paginate_by = 10
@@ -37,6 +49,7 @@ class StampListView(ListView):
         context = self.get_context_data()
         return self.render_to_response(context)
 
+    @use_replica
     def handle_export(self, request, queryset):
         file_type = request.GET.get("download")
         company_id = request.GET.get("company")
@@ -69,11 +82,13 @@ class StampListView(ListView):
             response["Content-Disposition"] = "attachment; filename=stamp_report.xlsx"
             return response
 
+    def get_summary_year(self):
+        return self.service.get_last_year((self.request.GET.get("date_to"),))
+
     def get_context_data(self, **kwargs):
         date_to = (self.request.GET.get("date_to"),)
-        year = self.service.get_last_year(date_to)
         context = super().get_context_data(**kwargs)
-        qs = self.object_list
+        summary = self.summary
 
         context.update(
             {
@@ -82,30 +97,29 @@ class StampListView(ListView):
                 "date_from": self.request.GET.get("date_from", ""),
                 "date_to": date_to or "",
                 "sort_by": self.request.GET.get("sort", "-created_at"),
-                "total_all_companies": self.service.total_amount(qs),
-                "total_pension": self.service.calculate_pension(qs, year),
-                "30_previous_year": self.service.get_30_from_previous_year(qs),
+                "total_all_companies": summary["total"],
+                "total_pension": summary["pension"],
+                "30_previous_year": summary["30_previous_year"],
             }
         )
         return context
 
 
-class GroupedStampListView(ListView):
+class GroupedStampListView(ReplicaReadMixin, ListView):
     template_name = "stamps/stamp_list_grouped.html"
     context_object_name = "grouped_qs"
     paginate_by = 10
+    paginator_class = ApproximateCountPaginator
 
     def get_queryset(self):
-        qs = self.service.get_queryset()
-        return self.service.grouped_by_company(qs)
+        return self.service.grouped_by_company()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        qs = self.object_list  # already evaluated queryset
-
-        context["total_all_companies"] = self.service.total_amount(qs)
-        context["total_companies"] = self.service.total_companies(qs)
+        totals = self.service.entity_summary_totals()
+        context["total_all_companies"] = totals["total"]
+        context["total_companies"] = totals["entities"]
 
         return context
 
@@ -130,16 +144,11 @@ class StampDetailView(DetailView):
         context = super().get_context_data(**kwargs)
 
         stamp = self.object  # already fetched once
-        company_id = stamp.company_id
-
-        qs = self.service.get_queryset()
-
-        context["total_amount_for_company"] = (
-            self.service.total_amount_for_company(qs, company_id)
-        )
+        balance = self.service.get_company_balance(stamp.company_id)
 
+        context["total_amount_for_company"] = balance.total_d1 if balance else 0
         context["total_invoice_copies_for_company"] = (
-            self.service.get_number_of_invoice_copies(qs, company_id)
+            balance.total_invoice_copies if balance else 0
         )
 
         return context
@@ -156,37 +165,24 @@ class StampCreateView(LoginRequiredMixin,SuccessMessageMixin, CreateView):
 
 
 class StampDashboardView(TemplateView):
-    template_name = "stamps/stamp_dashboard.html"
-
-    FILTER_MAP = {
-        "last_3_year": 3,
-        "last_5_years": 5,
-        "last_7_years": 7,
-        "last_10_years": 10,
-    }
+    """Page shell; the figures are loaded from StampDashboardDataView."""
 
-    def dispatch(self, request, *args, **kwargs):
-        self.service = StampService()
-        return super().dispatch(request, *args, **kwargs)
+    template_name = "stamps/stamp_dashboard.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context["current_filter"] = DashboardService.clean_filter(self.request.GET.get("filter"))
+        return context
 
-        time_filter = self.request.GET.get("filter", "all")
-        years = None if time_filter == "all" else self.FILTER_MAP.get(time_filter)
 
-        stamps = self.service.filter_by_years(self.service.get_queryset(), years)
+class StampDashboardDataView(DashboardDataMixin, View):
+    service_class = StampService
 
-        chart = self.service.yearly_chart(stamps)
 
-        context.update(
-            {
-                "total_stamps": self.service.total_amount(stamps),
-                "chart_categories": chart["categories"],
-                "stamp_data": chart["yearly"],
-                "total_past_stamp_data": chart["cumulative"],
-                "total_pension": self.service.calculate_pension(stamps),
-                "current_filter": time_filter,
-            }
-        )
-        return context
+class StampTimeSeriesView(TimeSeriesMixin, View):
+    service_class = StampService
+
+
+class StampPivotView(PivotMixin, View):
+    service_class = StampService
+    xlsx_filename = "stamp_company_year_pivot.xlsx"